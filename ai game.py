@@ -1,14 +1,15 @@
+import os
 import pygame
-import cv2
-import numpy as np
 import random
+import struct
 import sys
 import threading
 import time
-from deepface import DeepFace
-
-# Initialize Pygame
-pygame.init()
+from collision import boxes_overlap, hits_box, sprite_mask
+from metrics import REGISTRY, start_from_env
+from profiler import FrameProfiler
+from rendering import DirtyScreen, get_events, init_subsystems, load_font, needs_repaint
+from snapshot import STATES, pack_rng, pack_strings, pack_values, unpack_rng, unpack_strings, unpack_values
 
 # Game constants
 SCREEN_WIDTH = 800
@@ -17,6 +18,11 @@ FPS = 60
 GRAVITY = 0.8
 JUMP_STRENGTH = -15
 GROUND_HEIGHT = 100
+DIRTY_RECTS = True  # Only push changed regions to the display
+
+# frame, score, lives, spawn timer, state, difficulty, feedback timer, player y,
+# player velocity, jumping, speed boost, boost timer, obstacle count, collectible count
+SNAPSHOT_HEADER = struct.Struct("<IiiiBdiddBdiHH")
 
 # Colors
 WHITE = (255, 255, 255)
@@ -37,11 +43,27 @@ class EmotionDetector:
         self.frame = None
         self.detection_active = True
         
+        # Live metrics from the capture/analysis thread (see metrics.py)
+        self.frames_metric = REGISTRY.counter("emotion_frames_total", "Camera frames read")
+        self.dropped_metric = REGISTRY.counter("emotion_frames_dropped_total", "Failed camera reads")
+        self.analyses_metric = REGISTRY.counter("emotion_analyses_total", "DeepFace analyses run")
+        self.errors_metric = REGISTRY.counter("emotion_errors_total", "DeepFace analyses that raised")
+        self.latency_metric = REGISTRY.histogram("emotion_analysis_seconds", "DeepFace.analyze latency")
+        self.backlog_metric = REGISTRY.gauge("emotion_frames_since_analysis", "Frames read since the last analysis")
+        
     def start_camera(self):
         try:
-            self.cap = cv2.VideoCapture(0)
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+            # OpenCV is imported on first use so the menu appears without waiting for it
+            import cv2
+            hub = os.environ.get("CAMERA_HUB")
+            if hub:
+                # Share the camera with other processes through camera_hub.py; the flip below copies
+                from camera_hub import HubCapture
+                self.cap = HubCapture(hub)
+            else:
+                self.cap = cv2.VideoCapture(0)
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
             self.running = True
             
             # Start emotion detection in separate thread
@@ -53,13 +75,24 @@ class EmotionDetector:
             return False
     
     def detect_emotions(self):
+        try:
+            # DeepFace loads TensorFlow, so it is imported here, off the startup path
+            from deepface import DeepFace
+        except ImportError as e:
+            print(f"Emotion detection unavailable: {e}")
+            self.detection_active = False
+        # Face detector backend and input width picked by emotion_backends.py
+        from emotion_backends import analyze, load_config, mirror
+        config = load_config()
         last_detection = time.time()
         
         while self.running and self.cap and self.cap.isOpened():
             ret, frame = self.cap.read()
             if ret:
+                self.frames_metric.inc()
+                self.backlog_metric.inc()
                 # Flip frame horizontally for mirror effect
-                frame = cv2.flip(frame, 1)
+                frame = mirror(frame)
                 self.frame = frame.copy()
                 
                 # Detect emotions every 2 seconds to avoid overloading
@@ -67,12 +100,12 @@ class EmotionDetector:
                 if current_time - last_detection > 2.0 and self.detection_active:
                     try:
                         # Analyze emotions using DeepFace
-                        result = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
-                        
-                        if isinstance(result, list):
-                            result = result[0]
+                        start = time.perf_counter()
+                        emotions = analyze(DeepFace, frame, config)
+                        self.latency_metric.observe(time.perf_counter() - start)
+                        self.analyses_metric.inc()
+                        self.backlog_metric.set(0)
                         
-                        emotions = result['emotion']
                         dominant_emotion = max(emotions, key=emotions.get)
                         confidence = emotions[dominant_emotion]
                         
@@ -84,14 +117,19 @@ class EmotionDetector:
                         last_detection = current_time
                         
                     except Exception as e:
+                        self.errors_metric.inc()
                         print(f"Emotion detection error: {e}")
                         # Continue with current emotion on error
                         pass
+            else:
+                self.dropped_metric.inc()
             
             time.sleep(0.1)  # Small delay to prevent CPU overload
     
     def get_pygame_frame(self):
         if self.frame is not None:
+            import cv2
+            import numpy as np
             # Convert BGR to RGB and resize for display
             rgb_frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
             rgb_frame = cv2.resize(rgb_frame, (160, 120))
@@ -104,9 +142,14 @@ class EmotionDetector:
     def stop(self):
         self.running = False
         if self.cap:
+            import cv2
             self.cap.release()
+            cv2.destroyAllWindows()
 
 class Player:
+    __slots__ = ("width", "height", "x", "y", "ground_y", "velocity_y", "is_jumping",
+                 "speed_boost", "boost_timer")
+    
     def __init__(self):
         self.width = 50
         self.height = 60
@@ -152,11 +195,14 @@ class Player:
         pygame.draw.circle(screen, BLACK, (self.x + 15, self.y + 15), 3)
         pygame.draw.circle(screen, BLACK, (self.x + 35, self.y + 15), 3)
         pygame.draw.arc(screen, BLACK, (self.x + 15, self.y + 25, 20, 15), 0, 3.14, 2)
+        return self.get_rect()
     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
 
 class Obstacle:
+    __slots__ = ("width", "height", "x", "y", "speed")
+    
     def __init__(self, x, speed_multiplier=1.0):
         self.width = 30
         self.height = 50
@@ -168,12 +214,14 @@ class Obstacle:
         self.x -= self.speed
     
     def draw(self, screen):
-        pygame.draw.rect(screen, RED, (self.x, self.y, self.width, self.height))
+        return pygame.draw.rect(screen, RED, (self.x, self.y, self.width, self.height))
     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
 
 class Collectible:
+    __slots__ = ("width", "height", "x", "y", "speed")
+    
     def __init__(self, x):
         self.width = 25
         self.height = 25
@@ -185,23 +233,46 @@ class Collectible:
         self.x -= self.speed
     
     def draw(self, screen):
-        pygame.draw.circle(screen, GREEN, (self.x + self.width//2, self.y + self.height//2), self.width//2)
+        return pygame.draw.circle(screen, GREEN, (self.x + self.width//2, self.y + self.height//2), self.width//2)
     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def get_mask(self):
+        return sprite_mask("mirror collectible", (self.width, self.height), lambda: Collectible(0))
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("AI Mirror Game")
+    def __init__(self, headless=False, seed=None):
+        self.headless = headless
+        init_subsystems()
+        self.use_camera = not headless
+        # All gameplay randomness comes from one seeded generator so sessions can be replayed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.recorder = None
+        self.recorded_emotion = None
+        self.frame = 0
+        if headless:
+            # Offscreen target: no window or camera; emotions come from step()
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("AI Mirror Game")
         self.clock = pygame.time.Clock()
         
-        self.font_large = pygame.font.Font(None, 48)
-        self.font_medium = pygame.font.Font(None, 36)
-        self.font_small = pygame.font.Font(None, 24)
+        # Playfield background is static, so it is drawn once and reused
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert(self.screen)
+        background.fill(BLACK)
+        pygame.draw.rect(background, GREEN, (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
+        self.profiler = FrameProfiler("mirror", ["events", "spawn", "update", "draw", "camera", "present", "tick"])
+        self.dirty = DirtyScreen(self.screen, background, DIRTY_RECTS, display=not headless)
+        
+        self.font_large = load_font(48)
+        self.font_medium = load_font(36)
+        self.font_small = load_font(24)
         
         # Game state
-        self.game_state = "menu"  # "menu", "playing", "game_over"
+        self.game_state = "playing" if headless else "menu"  # "menu", "playing", "game_over"
         self.reset_game()
         
         # Emotion detection
@@ -222,6 +293,50 @@ class Game:
         self.spawn_timer = 0
         self.lives = 3
         self.difficulty_modifier = 1.0
+    
+    def snapshot(self):
+        """Pack the whole simulation state, RNG included, into bytes"""
+        player = self.player
+        values = []
+        for obstacle in self.obstacles:
+            values += (obstacle.x, obstacle.speed)
+        values += [collectible.x for collectible in self.collectibles]
+        header = SNAPSHOT_HEADER.pack(
+            self.frame, self.score, self.lives, self.spawn_timer, STATES.index(self.game_state),
+            self.difficulty_modifier, self.feedback_timer,
+            player.y, player.velocity_y, player.is_jumping, player.speed_boost, player.boost_timer,
+            len(self.obstacles), len(self.collectibles))
+        strings = pack_strings(self.emotion_detector.current_emotion,
+                               getattr(self, 'last_processed_emotion', ""), self.emotion_feedback)
+        return header + pack_values(values) + strings + pack_rng(self.rng)
+    
+    def restore(self, data):
+        """Return to a state produced by snapshot()"""
+        (self.frame, self.score, self.lives, self.spawn_timer, state,
+         self.difficulty_modifier, self.feedback_timer,
+         y, velocity_y, is_jumping, speed_boost, boost_timer,
+         obstacle_count, collectible_count) = SNAPSHOT_HEADER.unpack_from(data)
+        self.game_state = STATES[state]
+        
+        player = self.player
+        player.y, player.velocity_y, player.is_jumping = y, velocity_y, bool(is_jumping)
+        player.speed_boost, player.boost_timer = speed_boost, boost_timer
+        
+        values, offset = unpack_values(data, SNAPSHOT_HEADER.size, 2 * obstacle_count + collectible_count)
+        self.obstacles = []
+        for i in range(0, 2 * obstacle_count, 2):
+            obstacle = Obstacle(values[i])
+            obstacle.speed = values[i + 1]
+            self.obstacles.append(obstacle)
+        self.collectibles = [Collectible(x) for x in values[2 * obstacle_count:]]
+        
+        (current, last_processed, self.emotion_feedback), offset = unpack_strings(data, offset)
+        self.emotion_detector.current_emotion = current
+        if last_processed:
+            self.last_processed_emotion = last_processed
+        elif hasattr(self, 'last_processed_emotion'):
+            del self.last_processed_emotion
+        unpack_rng(self.rng, data, offset)
         
     def start_camera(self):
         if not self.emotion_detector.start_camera():
@@ -264,7 +379,7 @@ class Game:
             spawn_x = SCREEN_WIDTH + 50
             
             # 70% obstacles, 30% collectibles
-            if random.random() < 0.7:
+            if self.rng.random() < 0.7:
                 self.obstacles.append(Obstacle(spawn_x, self.player.speed_boost))
             else:
                 self.collectibles.append(Collectible(spawn_x))
@@ -274,34 +389,36 @@ class Game:
     def draw_ui(self):
         # Score
         score_text = self.font_medium.render(f"Score: {self.score}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
+        self.dirty.mark(self.screen.blit(score_text, (10, 10)))
         
         # Lives
         lives_text = self.font_medium.render(f"Lives: {self.lives}", True, WHITE)
-        self.screen.blit(lives_text, (10, 50))
+        self.dirty.mark(self.screen.blit(lives_text, (10, 50)))
         
         # Current emotion
         emotion_text = self.font_small.render(f"Emotion: {self.emotion_detector.current_emotion.title()}", True, WHITE)
-        self.screen.blit(emotion_text, (10, 90))
+        self.dirty.mark(self.screen.blit(emotion_text, (10, 90)))
         
         # Emotion feedback
         if self.feedback_timer > 0:
             feedback_surface = self.font_small.render(self.emotion_feedback, True, YELLOW)
             feedback_rect = feedback_surface.get_rect(center=(SCREEN_WIDTH//2, 150))
-            pygame.draw.rect(self.screen, BLACK, feedback_rect.inflate(20, 10))
+            self.dirty.mark(pygame.draw.rect(self.screen, BLACK, feedback_rect.inflate(20, 10)))
             self.screen.blit(feedback_surface, feedback_rect)
             self.feedback_timer -= 1
         
         # Camera feed
+        self.profiler.mark("draw")
         camera_surface = self.emotion_detector.get_pygame_frame()
         if camera_surface:
             camera_rect = pygame.Rect(SCREEN_WIDTH - 170, 10, 160, 120)
-            pygame.draw.rect(self.screen, WHITE, camera_rect.inflate(4, 4))
+            self.dirty.mark(pygame.draw.rect(self.screen, WHITE, camera_rect.inflate(4, 4)))
             self.screen.blit(camera_surface, camera_rect)
             
             # Camera label
             cam_label = self.font_small.render("AI Mirror", True, WHITE)
-            self.screen.blit(cam_label, (SCREEN_WIDTH - 170, 135))
+            self.dirty.mark(self.screen.blit(cam_label, (SCREEN_WIDTH - 170, 135)))
+        self.profiler.mark("camera")
     
     def main_menu(self):
         self.screen.fill(BLACK)
@@ -348,9 +465,22 @@ class Game:
         self.screen.blit(score_text, score_rect)
         self.screen.blit(restart_text, restart_rect)
     
-    def game_loop(self):
+    def step(self, jump=False, emotion=None):
+        """Advance the simulation by one tick with scripted input instead of the camera"""
+        if emotion is not None:
+            self.emotion_detector.current_emotion = emotion
+        if jump and self.game_state == "playing":
+            self.player.jump()
+        self.update()
+    
+    def update(self):
         # Process current emotion
         current_emotion = self.emotion_detector.current_emotion
+        if self.recorder and current_emotion != self.recorded_emotion:
+            # The camera is an input too; log what this frame saw
+            self.recorder.emotion(self.frame, current_emotion)
+            self.recorded_emotion = current_emotion
+        self.frame += 1
         if hasattr(self, 'last_processed_emotion'):
             if current_emotion != self.last_processed_emotion:
                 self.process_emotion(current_emotion)
@@ -361,16 +491,22 @@ class Game:
         
         # Spawn objects
         self.spawn_objects()
+        self.profiler.mark("spawn")
         
         # Update player
-        self.player.update()
+        player = self.player
+        player.update()
+        # Broadphase: only entities level with the player along x are tested further
+        left, right = player.x, player.x + player.width
         
-        # Update obstacles
+        # Update obstacles; the player and obstacles are solid boxes, so no masks needed
         for obstacle in self.obstacles[:]:
             obstacle.update()
             if obstacle.x < -obstacle.width:
                 self.obstacles.remove(obstacle)
-            elif self.player.get_rect().colliderect(obstacle.get_rect()):
+            elif (obstacle.x < right and obstacle.x + obstacle.width > left
+                  and boxes_overlap(player.x, player.y, player.width, player.height,
+                                    obstacle.x, obstacle.y, obstacle.width, obstacle.height)):
                 self.obstacles.remove(obstacle)
                 self.lives -= 1
                 if self.lives <= 0:
@@ -381,69 +517,101 @@ class Game:
             collectible.update()
             if collectible.x < -collectible.width:
                 self.collectibles.remove(collectible)
-            elif self.player.get_rect().colliderect(collectible.get_rect()):
+            elif (collectible.x < right and collectible.x + collectible.width > left
+                  and hits_box(collectible.x, collectible.y, collectible.get_mask(),
+                               player.x, player.y, player.width, player.height)):
                 self.collectibles.remove(collectible)
                 self.score += 10
-        
-        # Draw everything
-        self.screen.fill(BLACK)
-        
-        # Draw ground
-        pygame.draw.rect(self.screen, GREEN, (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
+    
+    def draw(self):
+        # Draw everything over the cached background and ground
+        self.dirty.clear()
         
         # Draw game objects
         for obstacle in self.obstacles:
-            obstacle.draw(self.screen)
+            self.dirty.mark(obstacle.draw(self.screen))
         
         for collectible in self.collectibles:
-            collectible.draw(self.screen)
+            self.dirty.mark(collectible.draw(self.screen))
         
-        self.player.draw(self.screen)
+        self.dirty.mark(self.player.draw(self.screen))
         
         # Draw UI
         self.draw_ui()
     
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+    def game_loop(self):
+        self.update()
+        self.profiler.mark("update")
+        self.draw()
+        self.dirty.mark(self.profiler.draw(self.screen))
+        self.profiler.mark("draw")
+    
+    def press_space(self):
+        if self.recorder:
+            self.recorder.space(self.frame)
+        if self.game_state == "menu":
+            if self.use_camera:
+                self.start_camera()
+            self.game_state = "playing"
+        elif self.game_state == "playing":
+            self.player.jump()
+        elif self.game_state == "game_over":
+            self.reset_game()
+            self.game_state = "playing"
+    
+    def handle_events(self, block=False):
+        for event in get_events(block):
+            if needs_repaint(event):
+                self.dirty.invalidate()
+            elif event.type == pygame.QUIT:
                 return False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    if self.game_state == "menu":
-                        self.start_camera()
-                        self.game_state = "playing"
-                    elif self.game_state == "playing":
-                        self.player.jump()
-                    elif self.game_state == "game_over":
-                        self.reset_game()
-                        self.game_state = "playing"
+                    self.press_space()
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle()
                 elif event.key == pygame.K_ESCAPE:
                     return False
         return True
     
     def run(self):
         running = True
+        shown_state = None
         while running:
-            running = self.handle_events()
+            self.profiler.begin_frame()
+            # Menu and game over screens are static: draw them once, then sleep until input
+            idle = self.game_state != "playing" and self.game_state == shown_state and not self.dirty.full_redraw
+            running = self.handle_events(block=idle)
+            self.profiler.mark("events")
+            
+            if self.game_state != shown_state:
+                self.dirty.invalidate()
+                shown_state = self.game_state
             
-            if self.game_state == "menu":
-                self.main_menu()
-            elif self.game_state == "playing":
+            if self.game_state == "playing":
                 self.game_loop()
-            elif self.game_state == "game_over":
-                self.game_over_screen()
+            elif self.dirty.full_redraw:
+                if self.game_state == "menu":
+                    self.main_menu()
+                elif self.game_state == "game_over":
+                    self.game_over_screen()
+                self.profiler.mark("draw")
+            self.dirty.present()
+            self.profiler.mark("present")
             
-            pygame.display.flip()
             self.clock.tick(FPS)
+            self.profiler.mark("tick")
+            self.profiler.end_frame()
         
         # Cleanup
+        self.profiler.dump_csv()
         self.emotion_detector.stop()
         pygame.quit()
-        cv2.destroyAllWindows()
         sys.exit()
 
 if __name__ == "__main__":
     print("Starting AI Mirror Game...")
     print("Make sure your webcam is connected and working!")
+    start_from_env()
     game = Game()
     game.run()
@@ -1,27 +1,84 @@
+import argparse
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import math
+import time
+from detection_backends import BACKENDS, create_backend
+from detection_log import DetectionLogWriter
+from detection_quality import QUALITY_LEVELS, QualityController
+from metrics import REGISTRY
+from tiled_detection import TiledDetector
+from zone_analytics import ZoneAnalytics, load_config
 
 class ObjectDetector:
-    def __init__(self):
-        # Load YOLOv8 nano model (smaller, faster)
-        print("Loading YOLO model...")
-        self.model = YOLO('yolov8n.pt')  # Downloads automatically on first run
+    def __init__(self, target_fps=15, adaptive=True, backend="ultralytics", weights=None, threads=None,
+                 log_path=None, zones_path=None, analytics_path=None, resolution=(640, 480),
+                 tile_size=0, tile_overlap=0.2, tile_workers=0, camera_hub=None):
+        # Load the detection model; YOLOv8 nano by default (smaller, faster)
+        print(f"Loading {backend} model...")
+        self.backend = create_backend(backend, weights, threads)
+        if tile_size:
+            # Large frames are cut into model-sized tiles instead of being downscaled
+            self.backend = TiledDetector(self.backend, tile_size, tile_overlap, tile_workers)
         
         # Initialize webcam
-        self.cap = cv2.VideoCapture(1)
-        if not self.cap.isOpened():
-            raise ValueError("Could not open webcam")
-        
-        # Set webcam resolution
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        if camera_hub:
+            # Frames come from a running camera_hub.py; copied because run() draws on them
+            from camera_hub import HubCapture
+            try:
+                self.cap = HubCapture(camera_hub, copy=True)
+            except FileNotFoundError:
+                raise ValueError(f"No camera hub named '{camera_hub}' is running")
+        else:
+            self.cap = cv2.VideoCapture(1)
+            if not self.cap.isOpened():
+                raise ValueError("Could not open webcam")
+            
+            # Set webcam resolution
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
         
         # Known reference for distance estimation (optional)
         # Assuming average person height is 170cm and appears as ~400 pixels
         self.pixels_per_cm = 400 / 170  # Rough calibration
         
+        # Input size, confidence and detection interval adapt to inference latency
+        self.quality = QualityController(target_fps, QUALITY_LEVELS if adaptive else QUALITY_LEVELS[:1])
+        
+        # Optional on-disk record of every detection for later time range queries
+        self.log = DetectionLogWriter(log_path, self.backend.names) if log_path else None
+        self.detections = None
+        
+        # Optional zone occupancy / line crossing counters
+        self.analytics = None
+        if zones_path:
+            zones, lines = load_config(zones_path)
+            self.analytics = ZoneAnalytics(zones, lines, self.backend.names, flush_path=analytics_path)
+        
+        # Live metrics, updated every frame; see metrics.py for how they are exposed
+        self.frames_metric = REGISTRY.counter("tracker_frames_total", "Frames read from the camera")
+        self.skipped_metric = REGISTRY.counter("tracker_frames_skipped_total", "Frames shown without detection")
+        self.dropped_metric = REGISTRY.counter("tracker_frames_dropped_total", "Failed frame grabs")
+        self.detections_metric = REGISTRY.counter("tracker_detections_total", "Objects detected")
+        self.inference_metric = REGISTRY.histogram("tracker_inference_seconds", "Model inference latency")
+        self.fps_metric = REGISTRY.gauge("tracker_fps", "Display frames per second")
+        self.quality_metric = REGISTRY.gauge("tracker_quality_level", "Index into QUALITY_LEVELS, 0 is best")
+        self.log_queue_metric = REGISTRY.gauge("tracker_log_queue_depth", "Detections buffered for the log")
+    
+    def draw_analytics(self, frame):
+        """Draw zones and lines with their live counts"""
+        analytics = self.analytics
+        for name, polygon in zip(analytics.zone_names, analytics.polygons):
+            points = polygon.astype(np.int32)
+            cv2.polylines(frame, [points], True, (0, 255, 255), 2)
+            cv2.putText(frame, f"{name}: {analytics.zone(name)['current']}", tuple(points[0]),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+        for name, a, b in zip(analytics.line_names, analytics.line_a.astype(int), analytics.line_b.astype(int)):
+            counts = analytics.line(name)
+            cv2.line(frame, tuple(a), tuple(b), (255, 0, 255), 2)
+            cv2.putText(frame, f"{name}: {counts['forward']} in / {counts['backward']} out", tuple(a),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 1)
+        
     def calculate_distance(self, center1, center2):
         """Calculate Euclidean distance between two points"""
         x1, y1 = center1
@@ -57,51 +114,68 @@ class ObjectDetector:
         center_y = int((y1 + y2) / 2)
         return (center_x, center_y)
     
+    def detect(self, frame):
+        """Run the model at the current quality level and return the detected objects"""
+        quality = self.quality
+        start = time.perf_counter()
+        detections = self.backend.detect(frame, quality.size, quality.confidence)
+        latency = time.perf_counter() - start
+        quality.record(latency)
+        self.detections = detections
+        self.inference_metric.observe(latency)
+        self.detections_metric.inc(len(detections))
+        self.quality_metric.set(quality.level)
+        
+        names = self.backend.names
+        return [{
+            'center': tuple(center),
+            'box': box,
+            'class': names[class_id],
+            'confidence': confidence
+        } for box, center, confidence, class_id in zip(detections.boxes.tolist(), detections.centers().tolist(),
+                                                       detections.scores.tolist(), detections.class_ids.tolist())]
+    
     def run(self):
         """Main detection loop"""
         print("Starting object detection. Press 'q' to quit.")
+        colors = [(0, 255, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255)]
+        frame_index = 0
+        detected_objects = []
+        last_frame_time = time.perf_counter()
+        fps = 0.0
         
         while True:
             ret, frame = self.cap.read()
             if not ret:
+                self.dropped_metric.inc()
                 print("Failed to grab frame")
                 break
+            self.frames_metric.inc()
+            frame_time = time.perf_counter()
+            fps += 0.1 * (1 / max(frame_time - last_frame_time, 1e-6) - fps)
+            last_frame_time = frame_time
+            self.fps_metric.set(round(fps, 2))
             
-            # Run YOLO detection
-            results = self.model(frame, verbose=False)
+            # Run YOLO detection; skipped frames reuse the last detections
+            if self.quality.should_detect(frame_index):
+                detected_objects = self.detect(frame)
+                now = time.time()
+                if self.log:
+                    self.log.append(now, frame_index, self.detections)
+                if self.analytics:
+                    self.analytics.update(now, self.detections.centers(), self.detections.class_ids)
+            else:
+                self.skipped_metric.inc()
+            if self.log:
+                self.log_queue_metric.set(self.log.buffered)
+            frame_index += 1
             
-            # Process detections
-            detected_objects = []
-            colors = [(0, 255, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255)]
-            
-            for r in results:
-                boxes = r.boxes
-                if boxes is not None:
-                    for i, box in enumerate(boxes):
-                        # Get box coordinates, confidence, and class
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = box.conf[0].cpu().numpy()
-                        class_id = int(box.cls[0].cpu().numpy())
-                        class_name = self.model.names[class_id]
-                        
-                        # Filter by confidence threshold
-                        if confidence > 0.5:
-                            color = colors[i % len(colors)]
-                            
-                            # Draw bounding box
-                            self.draw_bounding_box(frame, [x1, y1, x2, y2], class_name, confidence, color)
-                            
-                            # Store object info
-                            center = self.get_box_center([x1, y1, x2, y2])
-                            detected_objects.append({
-                                'center': center,
-                                'box': [x1, y1, x2, y2],
-                                'class': class_name,
-                                'confidence': confidence
-                            })
-                            
-                            # Draw center point
-                            cv2.circle(frame, center, 5, color, -1)
+            for i, obj in enumerate(detected_objects):
+                color = colors[i % len(colors)]
+                
+                # Draw bounding box and center point
+                self.draw_bounding_box(frame, obj['box'], obj['class'], obj['confidence'], color)
+                cv2.circle(frame, obj['center'], 5, color, -1)
             
             # Calculate distance if exactly 2 objects detected
             if len(detected_objects) == 2:
@@ -125,10 +199,18 @@ class ObjectDetector:
                 objects_text = f"Objects: {obj1_name} <-> {obj2_name}"
                 cv2.putText(frame, objects_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
             
+            if self.analytics:
+                self.draw_analytics(frame)
+            
             # Display object count
             count_text = f"Objects detected: {len(detected_objects)}"
             cv2.putText(frame, count_text, (10, frame.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
             
+            # Show the current detection quality
+            quality = self.quality
+            quality_text = f"{quality.size}px conf {quality.confidence:.2f} every {quality.every}"
+            cv2.putText(frame, quality_text, (10, frame.shape[0] - 45), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            
             # Show instructions
             instruction_text = "Press 'q' to quit"
             cv2.putText(frame, instruction_text, (frame.shape[1] - 150, frame.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
@@ -141,14 +223,47 @@ class ObjectDetector:
                 break
         
         # Cleanup
+        if self.log:
+            self.log.close()
+        if self.analytics:
+            self.analytics.flush()
         self.cap.release()
         cv2.destroyAllWindows()
         print("Program ended.")
 
 def main():
     """Main function to run the object detector"""
+    parser = argparse.ArgumentParser(description="Object detection with distance measurement")
+    parser.add_argument("--target-fps", type=float, default=15, help="frame rate to keep detection within")
+    parser.add_argument("--fixed-quality", action="store_true", help="always detect at full quality")
+    parser.add_argument("--backend", default="ultralytics", choices=BACKENDS)
+    parser.add_argument("--weights", help="model file for the backend, e.g. yolov8n.onnx")
+    parser.add_argument("--threads", type=int, help="inference threads")
+    parser.add_argument("--resolution", default="640x480", help="camera capture size, e.g. 1920x1080")
+    parser.add_argument("--tile", type=int, default=0, help="tile size for tiled inference, 0 to disable")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="fraction of a tile shared with its neighbour")
+    parser.add_argument("--tile-workers", type=int, default=0,
+                        help="threads for tiles (onnx backend only); 0 runs them as one batch")
+    parser.add_argument("--camera-hub", help="read frames from the camera_hub.py with this name")
+    parser.add_argument("--log", help="append every detection to this detection log")
+    parser.add_argument("--zones", help="JSON file of zones and lines to count")
+    parser.add_argument("--analytics-out", default="zone_counts.jsonl", help="where zone counts are flushed")
+    parser.add_argument("--metrics-port", type=int, help="serve metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-json", help="rewrite a JSON metrics snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between JSON snapshots")
+    args = parser.parse_args()
+    
+    if args.metrics_port:
+        REGISTRY.serve(args.metrics_port)
+    if args.metrics_json:
+        REGISTRY.dump_every(args.metrics_json, args.metrics_interval)
     try:
-        detector = ObjectDetector()
+        detector = ObjectDetector(args.target_fps, adaptive=not args.fixed_quality,
+                                  backend=args.backend, weights=args.weights, threads=args.threads,
+                                  log_path=args.log, zones_path=args.zones, analytics_path=args.analytics_out,
+                                  resolution=tuple(int(v) for v in args.resolution.split("x")),
+                                  tile_size=args.tile, tile_overlap=args.tile_overlap, tile_workers=args.tile_workers,
+                                  camera_hub=args.camera_hub)
         detector.run()
     except ValueError as e:
         print(f"Error: {e}")
@@ -156,6 +271,8 @@ def main():
         print("\nProgram interrupted by user.")
     except Exception as e:
         print(f"An error occurred: {e}")
+    if args.metrics_json:
+        REGISTRY.dump(args.metrics_json)
 
 if __name__ == "__main__":
     main()
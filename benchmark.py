@@ -0,0 +1,233 @@
+"""Scripted performance benchmarks for the game loops.
+
+Runs each game headlessly under the SDL dummy video driver with a fixed seed
+and scripted input, sweeping the number of on-screen entities. Every case is
+measured update-only and update+draw, and each game's snapshot()/restore()
+is timed and checked for exact round trips. Results are written as JSON; with
+--baseline, any case whose throughput dropped by more than --threshold fails
+the run (exit status 1).
+
+Usage:
+    python benchmark.py --out bench.json
+    python benchmark.py --games flappy eco --entities 0 50 --baseline bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from headless import is_over, load_game_module, restart, use_dummy_drivers
+
+JUMP_EVERY = 25
+ALLOC_SAMPLE_STEPS = 200  # tracemalloc is slow, so allocations use a shorter run
+SNAPSHOT_REPEATS = 2000
+SNAPSHOT_AHEAD = 120  # Frames stepped between a snapshot and its restore
+
+
+def entity_lists(name, game):
+    if name == "flappy":
+        return [game.pipes]
+    if name == "eco":
+        return [game.obstacles, game.eco_items]
+    return [game.obstacles, game.collectibles]
+
+
+def spawn_entity(name, module, game, x, i):
+    if name == "flappy":
+        game.pipes.append(module.Pipe(x, game.rng))
+    elif name == "eco":
+        if i % 2:
+            game.obstacles.append(module.Obstacle(x, game.rng.choice(["trash", "pollution"])))
+        else:
+            game.eco_items.append(module.EcoItem(x, game.rng.choice(["recycle", "tree", "water"])))
+    elif i % 2:
+        game.obstacles.append(module.Obstacle(x))
+    else:
+        game.collectibles.append(module.Collectible(x))
+
+
+def top_up(name, module, game, count):
+    """Keep `count` extra entities in play, spread over the next two screens"""
+    present = sum(len(entities) for entities in entity_lists(name, game))
+    width = module.SCREEN_WIDTH
+    for i in range(present, count):
+        spawn_entity(name, module, game, width + (i * 2 * width) // max(count, 1), i)
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_case(name, module, entities, draw, steps, seed):
+    game = module.Game(headless=True, seed=seed)
+    times = []
+
+    def advance(frame):
+        top_up(name, module, game, entities)
+        start = time.perf_counter()
+        game.step(frame % JUMP_EVERY == 0)
+        if draw:
+            game.draw()
+        elapsed = time.perf_counter() - start
+        if is_over(game):
+            restart(game)
+        return elapsed
+
+    for frame in range(steps):
+        times.append(advance(frame))
+
+    # Allocation pass: peak traced memory per frame and net live blocks
+    tracemalloc.start()
+    peak_total = 0
+    blocks_before = sys.getallocatedblocks()
+    for frame in range(ALLOC_SAMPLE_STEPS):
+        top_up(name, module, game, entities)
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        game.step(frame % JUMP_EVERY == 0)
+        if draw:
+            game.draw()
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+        if is_over(game):
+            restart(game)
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+
+    times.sort()
+    total = sum(times)
+    return {
+        "game": name,
+        "mode": "update+draw" if draw else "update",
+        "entities": entities,
+        "steps": steps,
+        "steps_per_second": steps / total if total else float("inf"),
+        "frame_ms": {
+            "p50": percentile(times, 0.50) * 1000,
+            "p90": percentile(times, 0.90) * 1000,
+            "p99": percentile(times, 0.99) * 1000,
+            "max": times[-1] * 1000,
+        },
+        "alloc_peak_bytes_per_frame": peak_total / ALLOC_SAMPLE_STEPS,
+        "net_blocks_per_frame": (blocks_after - blocks_before) / ALLOC_SAMPLE_STEPS,
+    }
+
+
+def run_snapshot_case(name, module, entities, seed):
+    """Snapshot size, snapshot/restore time and an exact round-trip check"""
+    game = module.Game(headless=True, seed=seed)
+    for frame in range(SNAPSHOT_AHEAD):
+        top_up(name, module, game, entities)
+        game.step(frame % JUMP_EVERY == 0)
+    data = game.snapshot()
+
+    start = time.perf_counter()
+    for _ in range(SNAPSHOT_REPEATS):
+        game.snapshot()
+    snapshot_time = (time.perf_counter() - start) / SNAPSHOT_REPEATS
+
+    # The original game, never restored, plays on to give the expected end state
+    for frame in range(SNAPSHOT_AHEAD):
+        game.step(frame % JUMP_EVERY == 0)
+    expected = game.snapshot()
+
+    start = time.perf_counter()
+    for _ in range(SNAPSHOT_REPEATS):
+        game.restore(data)
+    restore_time = (time.perf_counter() - start) / SNAPSHOT_REPEATS
+
+    # Stepping on from a restored snapshot must reproduce the original run
+    round_trip_ok = True
+    for _ in range(2):
+        game.restore(data)
+        for frame in range(SNAPSHOT_AHEAD):
+            game.step(frame % JUMP_EVERY == 0)
+        round_trip_ok = round_trip_ok and game.snapshot() == expected
+    return {
+        "game": name,
+        "mode": "snapshot",
+        "entities": entities,
+        "snapshot_bytes": len(data),
+        "snapshot_us": snapshot_time * 1e6,
+        "restore_us": restore_time * 1e6,
+        "round_trip_ok": round_trip_ok,
+    }
+
+
+def case_key(case):
+    return f"{case['game']}/{case['mode']}/{case['entities']}"
+
+
+def check_regressions(cases, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {case_key(case): case for case in json.load(f)["cases"]}
+    regressions = []
+    for case in cases:
+        old = baseline.get(case_key(case))
+        if case["mode"] == "snapshot":
+            if not case["round_trip_ok"]:
+                regressions.append(f"{case_key(case)}: restore does not reproduce the run")
+            continue
+        if old and case["steps_per_second"] < old["steps_per_second"] * (1 - threshold):
+            change = case["steps_per_second"] / old["steps_per_second"] - 1
+            regressions.append(f"{case_key(case)}: {change:+.1%} steps/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game loops headlessly")
+    parser.add_argument("--games", nargs="+", default=["flappy", "eco", "mirror"])
+    parser.add_argument("--entities", nargs="+", type=int, default=[0, 10, 50, 200])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--baseline", help="earlier JSON output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, e.g. 0.10")
+    args = parser.parse_args()
+
+    use_dummy_drivers()
+    cases = []
+    skipped = {}
+    for name in args.games:
+        try:
+            module = load_game_module(name)
+        except ImportError as e:
+            skipped[name] = str(e)
+            print(f"{name}: skipped ({e})")
+            continue
+        for entities in args.entities:
+            for draw in (False, True):
+                case = run_case(name, module, entities, draw, args.steps, args.seed)
+                cases.append(case)
+                print(f"{case_key(case):<28} {case['steps_per_second']:>10.0f} steps/s  "
+                      f"p99 {case['frame_ms']['p99']:.3f} ms  "
+                      f"{case['alloc_peak_bytes_per_frame']:.0f} B/frame")
+            case = run_snapshot_case(name, module, entities, args.seed)
+            cases.append(case)
+            print(f"{case_key(case):<28} {case['snapshot_bytes']:>7} B  "
+                  f"snapshot {case['snapshot_us']:.1f} us  restore {case['restore_us']:.1f} us  "
+                  f"round trip {'ok' if case['round_trip_ok'] else 'MISMATCH'}")
+
+    result = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "cases": cases,
+        "skipped": skipped,
+    }
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.baseline:
+        regressions = check_regressions(cases, args.baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""One camera, many local consumers, through a shared-memory frame ring.
+
+A single capture process decodes each frame once, straight into the next
+slot of a ring buffer in shared memory, and then publishes the frame's
+sequence number. Consumers attach by name and get NumPy views of the newest
+slot, with no copy and no pipe. The writer never waits for anyone: a slow
+consumer just skips frames, and valid(seq) tells it whether the slot it is
+still holding has been overwritten since.
+
+    python camera_hub.py --source 0 --width 640 --height 480    # start the hub
+    CAMERA_HUB=camera_hub python "ai game.py"                    # emotion detection from the hub
+    python "ai tracking.py" --camera-hub camera_hub              # object detection from the same camera
+"""
+import argparse
+import multiprocessing
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+DEFAULT_NAME = "camera_hub"
+HEADER_FIELDS = 8
+SEQUENCE, WIDTH, HEIGHT, CHANNELS, SLOTS, RUNNING = range(6)
+WRITING = -1  # Slot sequence while a frame is being written into it
+
+
+class FrameRing:
+    """Views over the shared block: int64 header, per-slot sequence and time, then the frames"""
+
+    def __init__(self, buffer, width, height, channels, slots):
+        self.header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=buffer)
+        offset = self.header.nbytes
+        self.slot_sequence = np.ndarray(slots, dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.slot_sequence.nbytes
+        self.slot_time = np.ndarray(slots, dtype=np.float64, buffer=buffer, offset=offset)
+        offset += self.slot_time.nbytes
+        self.frames = np.ndarray((slots, height, width, channels), dtype=np.uint8, buffer=buffer, offset=offset)
+        self.slots = slots
+
+    @staticmethod
+    def size(width, height, channels, slots):
+        return 8 * HEADER_FIELDS + 16 * slots + slots * height * width * channels
+
+
+def create_block(name, size):
+    """New shared block for the ring, replacing a stale one left by a hub that died"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        pass
+    # A live hub keeps publishing frames; a killed one left its block behind unchanged
+    stale = attach(name)
+    header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=stale.buf)
+    sequence = int(header[SEQUENCE])
+    time.sleep(1.0)
+    alive = bool(header[RUNNING]) and int(header[SEQUENCE]) != sequence
+    del header
+    stale.close()
+    if alive:
+        raise FileExistsError(f"another hub is already publishing as '{name}'")
+    print(f"Camera hub: replacing the stale '{name}' block of a hub that did not shut down")
+    shared_memory.SharedMemory(name=name).unlink()
+    return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+def capture_loop(name, source, width, height, slots, ready, opened):
+    capture = None
+    memory = None
+    try:
+        import cv2
+        capture = cv2.VideoCapture(source)
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        ok, frame = capture.read()
+        if not ok:
+            print(f"Camera hub: could not read from {source}")
+            return
+        # The camera may not honour the requested size; use what it delivers
+        height, width, channels = frame.shape
+
+        try:
+            memory = create_block(name, FrameRing.size(width, height, channels, slots))
+        except FileExistsError as e:
+            print(f"Camera hub: {e}")
+            return
+        ring = FrameRing(memory.buf, width, height, channels, slots)
+        ring.header[:] = 0
+        ring.header[[WIDTH, HEIGHT, CHANNELS, SLOTS, RUNNING]] = width, height, channels, slots, 1
+        ring.slot_sequence[:] = 0
+        opened.value = True
+    finally:
+        # Whatever failed, the parent must not be left waiting
+        ready.set()
+        if memory is None and capture is not None:
+            capture.release()
+    print(f"Camera hub '{name}': {width}x{height} from {source}, {slots} slots")
+
+    try:
+        fill_ring(ring, capture)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.header[RUNNING] = 0
+        capture.release()
+        ring = None  # Views must go before the block can be closed
+        memory.close()
+        memory.unlink()
+
+
+def fill_ring(ring, capture):
+    """Decode frames into successive slots until stopped or the source fails"""
+    sequence = int(ring.header[SEQUENCE])
+    while ring.header[RUNNING]:
+        sequence += 1
+        slot = sequence % ring.slots
+        target = ring.frames[slot]
+        ring.slot_sequence[slot] = WRITING
+        # Decode straight into shared memory; fall back to a copy if OpenCV reallocates
+        ok, decoded = capture.read(target)
+        if not ok:
+            print("Camera hub: frame grab failed, stopping")
+            break
+        if decoded is not None and decoded.ctypes.data != target.ctypes.data:
+            target[:] = decoded
+        ring.slot_time[slot] = time.time()
+        ring.slot_sequence[slot] = sequence
+        ring.header[SEQUENCE] = sequence
+
+
+def attach(name):
+    """Open an existing block without this process's resource tracker adopting it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        # Otherwise the tracker would unlink the hub's memory when this consumer exits
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+class CameraClient:
+    """Read-only access to a running hub"""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.memory = attach(name)
+        header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=self.memory.buf)
+        self.ring = FrameRing(self.memory.buf, int(header[WIDTH]), int(header[HEIGHT]),
+                              int(header[CHANNELS]), int(header[SLOTS]))
+        self.last = 0
+
+    @property
+    def running(self):
+        return bool(self.ring.header[RUNNING])
+
+    def latest(self):
+        """(sequence, frame view) of the newest complete frame, or (0, None) before the first"""
+        sequence = int(self.ring.header[SEQUENCE])
+        if not sequence:
+            return 0, None
+        return sequence, self.ring.frames[sequence % self.ring.slots]
+
+    def valid(self, sequence):
+        """Whether the slot holding frame `sequence` hasn't been reused yet"""
+        return self.ring.slot_sequence[sequence % self.ring.slots] == sequence
+
+    def wait(self, timeout=1.0, poll=0.001):
+        """Block until a frame newer than the last one returned arrives"""
+        deadline = time.perf_counter() + timeout
+        while self.running:
+            sequence, frame = self.latest()
+            if sequence > self.last:
+                self.last = sequence
+                return sequence, frame
+            if time.perf_counter() > deadline:
+                break
+            time.sleep(poll)
+        return 0, None
+
+    def stop_hub(self):
+        self.ring.header[RUNNING] = 0
+
+    def close(self):
+        self.ring = None
+        self.memory.close()
+
+
+class HubCapture:
+    """cv2.VideoCapture stand-in backed by a hub.
+
+    read() returns a view into shared memory unless copy=True. The writer
+    reuses that slot `slots` frames later, so a view can change under the
+    caller: use it right away (the game flips it into a new array at once)
+    or take a copy, also if the frame is drawn on, since other consumers see
+    the same pixels. With copy=True a copy torn by the writer is discarded
+    and the next frame is read instead.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, copy=False):
+        self.client = CameraClient(name)
+        self.copy = copy
+
+    def isOpened(self):
+        return self.client.ring is not None and self.client.running
+
+    def read(self):
+        while True:
+            sequence, frame = self.client.wait()
+            if frame is None:
+                return False, None
+            if not self.copy:
+                return True, frame
+            frame = frame.copy()
+            # The writer may have come round to this slot during the copy
+            if self.client.valid(sequence):
+                return True, frame
+
+    def set(self, prop, value):
+        return False  # The hub owns the camera settings
+
+    def release(self):
+        if self.client.ring is not None:
+            self.client.close()
+
+
+class CameraHub:
+    """Starts the capture process and waits until its shared memory exists"""
+
+    def __init__(self, source=0, width=640, height=480, slots=4, name=DEFAULT_NAME, timeout=10.0):
+        self.name = name
+        ready = multiprocessing.Event()
+        opened = multiprocessing.Value("b", False, lock=False)
+        self.process = multiprocessing.Process(target=capture_loop,
+                                               args=(name, source, width, height, slots, ready, opened), daemon=True)
+        self.process.start()
+        if not ready.wait(timeout):
+            self.process.terminate()
+            self.process.join()
+            raise ValueError(f"Camera hub did not open {source} within {timeout:.0f}s")
+        if not opened.value or not self.process.is_alive():
+            self.process.join()
+            raise ValueError(f"Camera hub could not open {source}")
+
+    def stop(self):
+        try:
+            client = CameraClient(self.name)
+        except FileNotFoundError:
+            pass  # Already gone, e.g. after Ctrl-C reached the capture process
+        else:
+            client.stop_hub()
+            client.close()
+        self.process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share one camera between local processes")
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--name", default=DEFAULT_NAME)
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    hub = CameraHub(source, args.width, args.height, args.slots, args.name)
+    client = CameraClient(args.name)
+    try:
+        while client.running:
+            start, _ = client.latest()
+            time.sleep(5)
+            end, _ = client.latest()
+            print(f"{(end - start) / 5:.1f} FPS, frame {end}")
+    except KeyboardInterrupt:
+        pass
+    client.close()
+    hub.stop()
+
+
+if __name__ == "__main__":
+    main()
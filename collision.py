@@ -0,0 +1,72 @@
+"""Pixel-accurate collision behind cheap bounding-box rejection.
+
+Each sprite variant gets one pygame.mask, built the first time it is needed
+by drawing a probe instance at the origin, and cached. The update loops first
+sweep entities along x against the player (plain number comparisons, no Rect
+objects); only pairs whose boxes overlap get a mask test.
+
+Masks are clipped to an entity's old hitbox, so a mask test can only turn a
+hit into a miss, never the other way round.
+"""
+import pygame
+
+_masks = {}
+
+
+def pixel(value):
+    """Round like pygame.Rect does: half away from zero"""
+    return int(value + 0.5) if value >= 0 else -int(0.5 - value)
+
+
+def sprite_mask(key, size, make_probe):
+    """Mask of what a make_probe() entity draws inside a size box at the origin"""
+    mask = _masks.get(key)
+    if mask is None:
+        probe = make_probe()
+        probe.x = probe.y = 0
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        probe.draw(surface)
+        mask = _masks[key] = pygame.mask.from_surface(surface)
+    return mask
+
+
+def solid_mask(width, height):
+    key = ("solid", width, height)
+    mask = _masks.get(key)
+    if mask is None:
+        mask = _masks[key] = pygame.Mask((width, height), fill=True)
+    return mask
+
+
+def hits(x, y, mask, other_x, other_y, other_mask):
+    """Whether two masks placed at (x, y) and (other_x, other_y) share a pixel"""
+    dx = pixel(other_x) - pixel(x)
+    dy = pixel(other_y) - pixel(y)
+    width, height = mask.get_size()
+    other_width, other_height = other_mask.get_size()
+    if dx >= width or dy >= height or dx <= -other_width or dy <= -other_height:
+        return False
+    return mask.overlap(other_mask, (dx, dy)) is not None
+
+
+def hits_box(x, y, mask, box_x, box_y, box_width, box_height):
+    """Whether a mask at (x, y) touches a solid box.
+
+    Only the part of the box inside the mask's bounds is tested, so the solid
+    masks needed are never larger than the sprite.
+    """
+    x, y = pixel(x), pixel(y)
+    width, height = mask.get_size()
+    left = max(pixel(box_x), x)
+    top = max(pixel(box_y), y)
+    right = min(pixel(box_x) + box_width, x + width)
+    bottom = min(pixel(box_y) + box_height, y + height)
+    if left >= right or top >= bottom:
+        return False
+    return mask.overlap(solid_mask(right - left, bottom - top), (left - x, top - y)) is not None
+
+
+def boxes_overlap(x, y, width, height, other_x, other_y, other_width, other_height):
+    """Rect.colliderect without building the Rects"""
+    x, y, other_x, other_y = pixel(x), pixel(y), pixel(other_x), pixel(other_y)
+    return x < other_x + other_width and other_x < x + width and y < other_y + other_height and other_y < y + height
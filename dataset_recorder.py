@@ -0,0 +1,323 @@
+"""Record play sessions as training data for imitation and RL agents.
+
+Each row is one decision: the screen and the Game.observe() state vector
+the player saw, the action taken while that frame was on screen (space
+pressed or not), and what the action led to: the reward (score gained by
+the next simulated frame) and a done flag (that frame ended the episode).
+A row is completed when the next frame arrives, so the terminal frame of an
+episode and the last frame of a session get no row of their own.
+
+Frames are copied from the surface's pixel buffer straight into
+preallocated .npy memory maps, so recording adds no file I/O or encoding
+to the game loop. Colour frames keep the surface's 32-bit pixel layout,
+because a whole-pixel copy is several times faster than picking out three
+channels. The loader converts them to RGB. Downscaling (every n-th pixel)
+and grayscale both shrink the chunks. Full-resolution colour frames are
+not free: about 0.6-0.7 ms per frame on average, with p99 spikes of
+several ms when the copy first touches new pages of a chunk. --scale 2
+keeps the mean near 0.3 ms; run the bench command to measure a machine.
+
+A dataset is a directory holding dataset.json plus chunk files of
+chunk_frames frames each. A new chunk is started when one fills up.
+
+Usage:
+    python dataset_recorder.py record flappy data/flappy --scale 2
+    python dataset_recorder.py record eco data/eco --scale 2 --grayscale
+    python dataset_recorder.py info data/flappy
+    python dataset_recorder.py bench flappy --scale 2 --grayscale
+
+    for batch in DatasetReader("data/flappy").batches(64, shuffle=True):
+        batch["frames"], batch["actions"], batch["rewards"], batch["dones"], batch["states"]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from headless import is_over, load_game_module, use_dummy_drivers
+
+MANIFEST = "dataset.json"
+CHUNK_FRAMES = 1024
+
+
+def step_dtype(state_size):
+    return np.dtype([("frame", "<u8"), ("episode", "<u4"), ("action", "u1"), ("done", "u1"),
+                     ("reward", "<f4"), ("state", "<f4", (state_size,))])
+
+
+def write_json(path, data):
+    # Write then rename so a reader never sees a half-written manifest
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(temporary, path)
+
+
+class DatasetRecorder:
+    """Appends one row of frame, action, reward, done and state per simulated frame"""
+
+    def __init__(self, directory, game_name, surface, state_fields, scale=1, grayscale=False,
+                 chunk_frames=CHUNK_FRAMES):
+        if surface.get_bytesize() != 4:
+            raise ValueError("Recording needs a 32-bit surface")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.scale = scale
+        self.grayscale = grayscale
+        self.chunk_frames = chunk_frames
+        width, height = surface.get_size()
+        self.height = -(-height // scale)
+        self.width = -(-width // scale)
+        # Byte index of each colour within a pixel (little-endian)
+        self.channels = [shift // 8 for shift in surface.get_shifts()[:3]]
+        # Preallocated fixed-point luma buffers, so grayscale allocates nothing per frame
+        self.luma = np.zeros((self.height, self.width), dtype=np.uint16)
+        self.term = np.zeros_like(self.luma)
+        self.manifest = {
+            "game": game_name,
+            "width": self.width,
+            "height": self.height,
+            "channels": 1 if grayscale else 4,
+            "rgb": self.channels,
+            "scale": scale,
+            "state_fields": list(state_fields),
+            "chunk_frames": chunk_frames,
+            "chunks": [],
+        }
+        self.dtype = step_dtype(len(state_fields))
+        self.frames = None
+        self.steps = None
+        self.count = 0
+        self.episode = 0
+        self.action = 0
+        self.pending = False  # Row self.count holds a frame still waiting for its outcome
+        self.last_frame = None
+        self.last_score = 0
+        self.open_chunk()
+
+    def open_chunk(self):
+        index = len(self.manifest["chunks"])
+        name = f"chunk_{index:05d}"
+        shape = (self.chunk_frames, self.height, self.width)
+        if not self.grayscale:
+            shape += (4,)
+        # The files are preallocated sparse; pages are filled in as frames arrive
+        self.frames = open_memmap(os.path.join(self.directory, name + ".frames.npy"), "w+", np.uint8, shape)
+        self.steps = open_memmap(os.path.join(self.directory, name + ".steps.npy"), "w+", self.dtype,
+                                 (self.chunk_frames,))
+        self.manifest["chunks"].append({"frames": name + ".frames.npy", "steps": name + ".steps.npy", "count": 0})
+        self.count = 0
+        self.save_manifest()
+
+    def save_manifest(self):
+        self.manifest["chunks"][-1]["count"] = self.count
+        write_json(os.path.join(self.directory, MANIFEST), self.manifest)
+
+    def press(self):
+        """Space was pressed while the last recorded frame was on screen"""
+        self.action = 1
+
+    def capture(self, surface, target):
+        height = surface.get_height()
+        pitch = surface.get_pitch() // 4
+        scale = self.scale
+        if self.grayscale:
+            pixels = np.frombuffer(surface.get_buffer(), np.uint8).reshape(height, pitch, 4)
+            pixels = pixels[::scale, :self.width * scale:scale]
+            red, green, blue = self.channels
+            # ITU-R 601 luma in 8-bit fixed point
+            luma, term = self.luma, self.term
+            np.multiply(pixels[..., red], 77, out=luma, dtype=np.uint16)
+            np.multiply(pixels[..., green], 150, out=term, dtype=np.uint16)
+            np.add(luma, term, out=luma)
+            np.multiply(pixels[..., blue], 29, out=term, dtype=np.uint16)
+            np.add(luma, term, out=luma)
+            np.right_shift(luma, 8, out=target, casting="unsafe")
+        else:
+            pixels = np.frombuffer(surface.get_buffer(), np.uint32).reshape(height, pitch)
+            target.view(np.uint32)[..., 0] = pixels[::scale, :self.width * scale:scale]
+
+    def record(self, surface, frame, score, done, state):
+        """Complete the previous frame's row with its outcome and start one for this frame.
+
+        Repeated calls for the same simulation frame are ignored.
+        """
+        if frame == self.last_frame:
+            return
+        self.last_frame = frame
+        if self.pending:
+            steps = self.steps
+            i = self.count
+            steps["action"][i] = self.action
+            steps["reward"][i] = score - self.last_score
+            steps["done"][i] = done
+            self.count += 1
+        # Presses between episodes (restart, menu) belong to no row
+        self.action = 0
+        if done:
+            # Nothing is decided on the game over frame; the next episode starts from a score of zero
+            self.pending = False
+            self.episode += 1
+            self.last_score = 0
+            return
+        if self.count == self.chunk_frames:
+            self.save_manifest()
+            self.open_chunk()
+        i = self.count
+        self.capture(surface, self.frames[i])
+        self.steps[i] = (frame, self.episode, 0, 0, 0.0, state)
+        self.pending = True
+        self.last_score = score
+
+    def close(self):
+        if self.frames is None:
+            return
+        self.save_manifest()
+        # Dropping the maps leaves write-back to the OS instead of blocking on msync
+        self.frames = self.steps = None
+
+
+class DatasetReader:
+    """Streams a recorded dataset back from its chunk files"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.chunks = [chunk for chunk in self.manifest["chunks"] if chunk["count"]]
+
+    def __len__(self):
+        return sum(chunk["count"] for chunk in self.chunks)
+
+    def chunk(self, i):
+        """(frames, steps) memory maps of one chunk, trimmed to the frames recorded"""
+        chunk = self.chunks[i]
+        count = chunk["count"]
+        frames = np.load(os.path.join(self.directory, chunk["frames"]), mmap_mode="r")[:count]
+        steps = np.load(os.path.join(self.directory, chunk["steps"]), mmap_mode="r")[:count]
+        return frames, steps
+
+    def rgb(self, frames):
+        """(..., height, width, 3) RGB from stored frames; grayscale frames are returned as they are"""
+        if self.manifest["channels"] == 1:
+            return np.asarray(frames)
+        return frames[..., self.manifest["rgb"]]
+
+    def batches(self, batch_size=64, shuffle=False, seed=None, drop_last=False):
+        """Yield dicts of frames, actions, rewards, dones, states, episodes and frame indices.
+
+        Chunks are read one at a time; with shuffle, both the chunk order and
+        the rows within each chunk are shuffled. Batches span chunk borders.
+        """
+        rng = np.random.default_rng(seed)
+        order = np.arange(len(self.chunks))
+        if shuffle:
+            rng.shuffle(order)
+        pending = []
+        pending_count = 0
+        for i in order:
+            frames, steps = self.chunk(i)
+            rows = rng.permutation(len(steps)) if shuffle else np.arange(len(steps))
+            start = 0
+            while start < len(rows):
+                take = rows[start:start + batch_size - pending_count]
+                start += len(take)
+                # Sorted reads touch the memory map sequentially
+                take = np.sort(take) if shuffle else take
+                pending.append((self.rgb(frames[take]), steps[take]))
+                pending_count += len(take)
+                if pending_count == batch_size:
+                    yield self.collate(pending)
+                    pending, pending_count = [], 0
+        if pending and not drop_last:
+            yield self.collate(pending)
+
+    @staticmethod
+    def collate(parts):
+        frames = np.concatenate([frames for frames, _ in parts])
+        steps = np.concatenate([steps for _, steps in parts])
+        return {"frames": frames, "actions": steps["action"], "rewards": steps["reward"],
+                "dones": steps["done"].astype(bool), "states": steps["state"],
+                "episodes": steps["episode"], "frame_indices": steps["frame"]}
+
+
+def start_recording(game, game_name, directory, scale=1, grayscale=False, chunk_frames=CHUNK_FRAMES):
+    game.dataset = DatasetRecorder(directory, game_name, game.screen, game.STATE_FIELDS, scale, grayscale,
+                                   chunk_frames)
+    return game.dataset
+
+
+def bench(game_name, frames, scale, grayscale, directory, chunk_frames=CHUNK_FRAMES):
+    """Per-frame recording cost on a headless game with random jumps"""
+    use_dummy_drivers()
+    module = load_game_module(game_name)
+    game = module.Game(headless=True, seed=0)
+    recorder = start_recording(game, game_name, directory, scale, grayscale, chunk_frames)
+    rng = random.Random(0)
+    times = np.empty(frames)
+    for i in range(frames):
+        if rng.random() < 0.05 or is_over(game):
+            game.press_space()
+        game.update()
+        game.draw()
+        start = time.perf_counter()
+        recorder.record(game.screen, game.frame, game.score, is_over(game), game.observe())
+        times[i] = time.perf_counter() - start
+    recorder.close()
+    print(f"{frames} frames at {recorder.width}x{recorder.height}x{recorder.manifest['channels']}: "
+          f"mean {times.mean() * 1e3:.3f} ms, p99 {np.percentile(times, 99) * 1e3:.3f} ms, "
+          f"max {times.max() * 1e3:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record gameplay datasets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="play normally while recording frames and actions")
+    rec.add_argument("game", choices=["flappy", "eco"])
+    rec.add_argument("directory")
+    rec.add_argument("--seed", type=int, default=None)
+    info = sub.add_parser("info", help="summarize a dataset")
+    info.add_argument("directory")
+    timing = sub.add_parser("bench", help="measure the recording cost per frame, headless")
+    timing.add_argument("game", choices=["flappy", "eco"])
+    timing.add_argument("--frames", type=int, default=2000)
+    timing.add_argument("--directory", default="dataset_bench")
+    for command in (rec, timing):
+        command.add_argument("--scale", type=int, default=1, help="keep every n-th pixel in each direction")
+        command.add_argument("--grayscale", action="store_true")
+        command.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        module = load_game_module(args.game)
+        game = module.Game(seed=args.seed)
+        recorder = start_recording(game, args.game, args.directory, args.scale, args.grayscale, args.chunk_frames)
+        try:
+            game.run()
+        finally:
+            recorder.close()
+            print(f"Recorded {len(DatasetReader(args.directory))} frames to {args.directory}")
+    elif args.command == "info":
+        reader = DatasetReader(args.directory)
+        manifest = reader.manifest
+        episodes = set()
+        actions = rewards = 0
+        for i in range(len(reader.chunks)):
+            _, steps = reader.chunk(i)
+            episodes.update(np.unique(steps["episode"]).tolist())
+            actions += int(steps["action"].sum())
+            rewards += float(steps["reward"].sum())
+        print(f"{manifest['game']}: {len(reader)} frames in {len(reader.chunks)} chunks, "
+              f"{manifest['width']}x{manifest['height']}x{manifest['channels']}, "
+              f"{len(episodes)} episodes, {actions} presses, total reward {rewards:g}")
+        print(f"State: {', '.join(manifest['state_fields'])}")
+    else:
+        bench(args.game, args.frames, args.scale, args.grayscale, args.directory, args.chunk_frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Inference backends for ObjectDetector in ai tracking.py.
+
+Every backend has detect(frame, size, confidence) -> Detections,
+detect_batch(frames, size, confidence) -> [Detections] and a names list
+mapping class ids to labels, so the detector doesn't care what runs the
+model:
+
+    ultralytics  YOLO .pt weights through the ultralytics package (PyTorch)
+    onnx         YOLOv8 exported to ONNX, run by ONNX Runtime on the CPU
+    stub         deterministic fake detections, no model or dependencies
+
+Heavy imports happen when a backend is created, not when this module loads.
+
+Compare backends on the same recorded clip:
+    python detection_backends.py clip.mp4 --backends ultralytics onnx stub --threads 4
+"""
+import argparse
+import ast
+import json
+import time
+import zlib
+
+import numpy as np
+
+BACKENDS = ["ultralytics", "onnx", "stub"]
+IOU_THRESHOLD = 0.7  # Same NMS threshold as ultralytics
+MAX_DETECTIONS = 300
+STUB_NAMES = ["person", "bicycle", "car", "cup", "chair"]
+
+
+class Detections:
+    """Boxes (N, 4) float32 as x1, y1, x2, y2 in frame pixels, scores (N,), class ids (N,)"""
+    __slots__ = ("boxes", "scores", "class_ids")
+
+    def __init__(self, boxes, scores, class_ids):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def centers(self):
+        return ((self.boxes[:, :2] + self.boxes[:, 2:]) / 2).astype(np.int32)
+
+    def select(self, keep):
+        return Detections(self.boxes[keep], self.scores[keep], self.class_ids[keep])
+
+
+def nms(boxes, scores, iou_threshold=IOU_THRESHOLD):
+    """Greedy non-maximum suppression; returns kept indices, best first"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        width = np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])
+        height = np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])
+        inter = width.clip(0) * height.clip(0)
+        order = rest[inter <= iou_threshold * (areas[best] + areas[rest] - inter)]
+    return np.array(keep, dtype=np.int64)
+
+
+def batched_nms(detections, iou_threshold=IOU_THRESHOLD):
+    """Per-class NMS in one pass by moving each class's boxes apart"""
+    if not len(detections):
+        return detections
+    offsets = detections.class_ids[:, None].astype(np.float32) * (detections.boxes.max() + 1)
+    keep = nms(detections.boxes + offsets, detections.scores, iou_threshold)
+    return detections.select(keep[:MAX_DETECTIONS])
+
+
+def letterbox(frame, size):
+    """Resize keeping the aspect ratio and pad to size x size; returns (image, scale, left, top)"""
+    import cv2
+    height, width = frame.shape[:2]
+    scale = min(size / width, size / height)
+    new_width, new_height = round(width * scale), round(height * scale)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    left, top = (size - new_width) // 2, (size - new_height) // 2
+    canvas[top:top + new_height, left:left + new_width] = cv2.resize(
+        frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, left, top
+
+
+class UltralyticsBackend:
+    name = "ultralytics"
+
+    def __init__(self, weights="yolov8n.pt", threads=None):
+        from ultralytics import YOLO
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(weights)  # Downloads automatically on first run
+        self.names = [self.model.names[i] for i in range(len(self.model.names))]
+
+    def detect(self, frame, size=640, confidence=0.5):
+        return self.detect_batch([frame], size, confidence)[0]
+
+    def detect_batch(self, frames, size=640, confidence=0.5):
+        results = self.model(list(frames), imgsz=size, conf=confidence, verbose=False)
+        return [Detections.empty() if result.boxes is None else
+                Detections(result.boxes.xyxy.cpu().numpy(), result.boxes.conf.cpu().numpy(),
+                           result.boxes.cls.cpu().numpy())
+                for result in results]
+
+
+class OnnxBackend:
+    """YOLOv8 ONNX export (yolo export model=yolov8n.pt format=onnx) on CPU"""
+    name = "onnx"
+
+    def __init__(self, weights="yolov8n.onnx", threads=None):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(weights, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Static exports only accept their own input size and batch size
+        self.fixed_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else None
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            names = ast.literal_eval(metadata["names"])
+            self.names = [names[i] for i in range(len(names))]
+        else:
+            self.names = [f"class {i}" for i in range(self.session.get_outputs()[0].shape[1] - 4)]
+
+    def detect(self, frame, size=640, confidence=0.5):
+        return self.detect_batch([frame], size, confidence)[0]
+
+    def detect_batch(self, frames, size=640, confidence=0.5):
+        size = self.fixed_size or size
+        if self.fixed_batch == 1 and len(frames) > 1:
+            return [self.detect(frame, size, confidence) for frame in frames]
+        images = [letterbox(frame, size) for frame in frames]
+        blob = np.stack([image[:, :, ::-1].transpose(2, 0, 1) for image, _, _, _ in images]).astype(np.float32) / 255
+        outputs = self.session.run(None, {self.input_name: blob})[0]
+        return [self.decode(output.T, frame, confidence, *letterboxed[1:])
+                for output, frame, letterboxed in zip(outputs, frames, images)]
+
+    def decode(self, output, frame, confidence, scale, left, top):
+        """Detections from one (anchors, 4 + classes) output in frame coordinates"""
+        class_scores = output[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores > confidence
+        cx, cy, w, h = output[keep, :4].T
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        # Undo the letterbox
+        boxes = (boxes - [left, top, left, top]) / scale
+        height, width = frame.shape[:2]
+        boxes = boxes.clip(0, [width, height, width, height])
+        return batched_nms(Detections(boxes, scores[keep], class_ids[keep]))
+
+
+class StubBackend:
+    """Fake detections seeded from the frame contents: same frame, same boxes"""
+    name = "stub"
+
+    def __init__(self, weights=None, threads=None, count=4, delay=0.0):
+        self.names = STUB_NAMES
+        self.count = count
+        self.delay = delay  # Simulated inference time in seconds
+
+    def detect(self, frame, size=640, confidence=0.5):
+        if self.delay:
+            time.sleep(self.delay)
+        rng = np.random.default_rng(zlib.crc32(np.ascontiguousarray(frame[::16, ::16]).tobytes()))
+        height, width = frame.shape[:2]
+        corners = rng.uniform(0, 1, (self.count, 2)) * [width * 0.8, height * 0.8]
+        sizes = rng.uniform(0.05, 0.2, (self.count, 2)) * [width, height]
+        scores = rng.uniform(0.3, 1.0, self.count)
+        class_ids = rng.integers(0, len(self.names), self.count)
+        keep = scores > confidence
+        return Detections(np.hstack([corners, corners + sizes])[keep], scores[keep], class_ids[keep])
+
+    def detect_batch(self, frames, size=640, confidence=0.5):
+        return [self.detect(frame, size, confidence) for frame in frames]
+
+
+def create_backend(name, weights=None, threads=None):
+    """Backend by name; weights default to the backend's own"""
+    backend = {"ultralytics": UltralyticsBackend, "onnx": OnnxBackend, "stub": StubBackend}[name]
+    return backend(weights, threads) if weights else backend(threads=threads)
+
+
+def box_intersection(boxes, others):
+    """Intersection area matrix between two (N, 4) and (M, 4) xyxy box arrays"""
+    width = np.minimum(boxes[:, None, 2], others[None, :, 2]) - np.maximum(boxes[:, None, 0], others[None, :, 0])
+    height = np.minimum(boxes[:, None, 3], others[None, :, 3]) - np.maximum(boxes[:, None, 1], others[None, :, 1])
+    return width.clip(0) * height.clip(0)
+
+
+def box_iou(boxes, others):
+    """IoU matrix between two (N, 4) and (M, 4) xyxy box arrays"""
+    inter = box_intersection(boxes, others)
+    areas = (boxes[:, 2:] - boxes[:, :2]).prod(axis=1)
+    other_areas = (others[:, 2:] - others[:, :2]).prod(axis=1)
+    return inter / (areas[:, None] + other_areas[None, :] - inter + 1e-9)
+
+
+def agreement(reference, detections, names, reference_names, iou_threshold=0.5):
+    """Fraction of reference boxes matched by a same-label box with IoU >= iou_threshold"""
+    if not len(reference):
+        return 1.0 if not len(detections) else 0.0
+    if not len(detections):
+        return 0.0
+    same_label = (np.array([reference_names[i] for i in reference.class_ids])[:, None]
+                  == np.array([names[i] for i in detections.class_ids])[None, :])
+    matched = ((box_iou(reference.boxes, detections.boxes) >= iou_threshold) & same_label).any(axis=1)
+    return float(matched.mean())
+
+
+def read_clip(path, max_frames):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def benchmark(frames, backend, size, confidence, warmup=5):
+    """Run every frame through backend; returns (sorted latencies in s, detections per frame)"""
+    for frame in frames[:warmup]:
+        backend.detect(frame, size, confidence)
+    latencies = []
+    outputs = []
+    for frame in frames:
+        start = time.perf_counter()
+        outputs.append(backend.detect(frame, size, confidence))
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detection backends on a recorded clip")
+    parser.add_argument("clip", help="video file; every backend sees the same frames")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--weights", nargs="*", default=[], metavar="BACKEND=PATH",
+                        help="e.g. onnx=models/yolov8n.onnx")
+    parser.add_argument("--threads", type=int, help="intra-op threads per backend")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--tile", type=int, default=0, help="tile size for tiled inference, 0 to disable")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    frames = read_clip(args.clip, args.frames)
+    if not frames:
+        print(f"Could not read frames from {args.clip}")
+        return
+    weights = dict(item.split("=", 1) for item in args.weights)
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, input {args.size}px")
+
+    results = []
+    reference = None
+    for name in args.backends:
+        try:
+            backend = create_backend(name, weights.get(name), args.threads)
+        except (ImportError, OSError) as e:
+            print(f"{name}: skipped ({e})")
+            continue
+        if args.tile:
+            from tiled_detection import TiledDetector
+            backend = TiledDetector(backend, args.tile)
+        latencies, outputs = benchmark(frames, backend, args.size, args.confidence)
+        # The first backend that runs is the reference for agreement
+        if reference is None:
+            reference = (outputs, backend.names)
+        matches = [agreement(ref, out, backend.names, reference[1]) for ref, out in zip(reference[0], outputs)]
+        result = {
+            "backend": name,
+            "fps": len(frames) / sum(latencies),
+            "latency_ms": {key: percentile(latencies, fraction) * 1000
+                           for key, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+            "detections_per_frame": sum(len(out) for out in outputs) / len(outputs),
+            "agreement": sum(matches) / len(matches),
+        }
+        results.append(result)
+        latency = result["latency_ms"]
+        print(f"{name:<12} {result['fps']:7.1f} FPS  p50 {latency['p50']:7.2f}  p90 {latency['p90']:7.2f}  "
+              f"p99 {latency['p99']:7.2f} ms  {result['detections_per_frame']:5.2f} det/frame  "
+              f"agreement {result['agreement']:.1%}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"clip": args.clip, "frames": len(frames), "size": args.size, "results": results}, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Append-only, time-indexed log of object detections.
+
+Records are fixed-width (RECORD below) and written in batches after a small
+file header, so the whole log can be opened as one np.memmap without parsing.
+A sparse sidecar index (<log>.idx) holds (timestamp, record number) for the
+first record of every INDEX_SECONDS bucket and at least every INDEX_RECORDS
+records. A time range query binary-searches the index and then one bounded
+block at each end, and returns a zero-copy slice of the memmap. Days of data
+never have to be loaded whole.
+
+Timestamps must not go backwards within one log.
+
+    python "ai tracking.py" --log detections.dlog
+    python detection_log.py detections.dlog --start "2026-10-19 14:03" --minutes 1
+"""
+import argparse
+import json
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b"DLOG"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")  # magic, version, record size
+RECORD = np.dtype([
+    ("timestamp", "<f8"),   # Unix time in seconds
+    ("frame", "<u8"),
+    ("track_id", "<i4"),    # -1 when the detection isn't tracked
+    ("class_id", "<i4"),
+    ("box", "<f4", (4,)),   # x1, y1, x2, y2 in frame pixels
+    ("confidence", "<f4"),
+])
+INDEX = np.dtype([("timestamp", "<f8"), ("record", "<u8")])
+INDEX_SECONDS = 10
+INDEX_RECORDS = 65536
+BATCH = 4096  # Records buffered before each write
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def names_path(path):
+    return path + ".names.json"
+
+
+class DetectionLogWriter:
+    """Buffers detections and appends them to the log in bulk"""
+
+    def __init__(self, path, names=None):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+        self.file = open(path, "r+b" if exists else "wb")
+        if exists:
+            check_header(self.file.read(HEADER.size), path)
+            # Drop a partial record left by a crash
+            self.count = (os.path.getsize(path) - HEADER.size) // RECORD.itemsize
+            self.file.truncate(HEADER.size + self.count * RECORD.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+            self.count = 0
+        self.index_file = open(index_path(path), "ab")
+        index = read_index(path)
+        self.last_bucket = int(index["timestamp"][-1] // INDEX_SECONDS) if len(index) else None
+        self.last_indexed = int(index["record"][-1]) if len(index) else 0
+        if names is not None:
+            with open(names_path(path), "w") as f:
+                json.dump(list(names), f)
+
+        self.buffer = np.zeros(BATCH, dtype=RECORD)
+        self.buffered = 0
+
+    def append(self, timestamp, frame_index, detections, track_ids=None):
+        """Log one frame's Detections (see detection_backends)"""
+        count = len(detections)
+        if self.buffered + count > BATCH:
+            self.flush()
+        if count > BATCH:
+            self.buffer = np.zeros(count, dtype=RECORD)
+        rows = self.buffer[self.buffered:self.buffered + count]
+        rows["timestamp"] = timestamp
+        rows["frame"] = frame_index
+        rows["track_id"] = -1 if track_ids is None else track_ids
+        rows["class_id"] = detections.class_ids
+        rows["box"] = detections.boxes
+        rows["confidence"] = detections.scores
+        self.buffered += count
+
+    def extend(self, records):
+        """Append records already in RECORD layout, e.g. from another log"""
+        for start in range(0, len(records), BATCH):
+            block = records[start:start + BATCH]
+            if self.buffered + len(block) > len(self.buffer):
+                self.flush()
+            self.buffer[self.buffered:self.buffered + len(block)] = block
+            self.buffered += len(block)
+
+    def flush(self):
+        if not self.buffered:
+            return
+        records = self.buffer[:self.buffered]
+        self.file.write(records.tobytes())
+        self.file.flush()
+
+        # Index entries where the time bucket or the record block changes
+        numbers = self.count + np.arange(self.buffered, dtype=np.int64)
+        buckets = (records["timestamp"] // INDEX_SECONDS).astype(np.int64)
+        previous = np.empty_like(buckets)
+        previous[0] = -1 if self.last_bucket is None else self.last_bucket
+        previous[1:] = buckets[:-1]
+        new_bucket = buckets != previous
+        new_block = numbers // INDEX_RECORDS != np.concatenate(
+            [[self.last_indexed // INDEX_RECORDS], numbers[:-1] // INDEX_RECORDS])
+        starts = np.flatnonzero(new_bucket | new_block)
+        if len(starts):
+            entries = np.zeros(len(starts), dtype=INDEX)
+            entries["timestamp"] = records["timestamp"][starts]
+            entries["record"] = numbers[starts]
+            self.index_file.write(entries.tobytes())
+            self.index_file.flush()
+            self.last_indexed = int(numbers[starts[-1]])
+        self.last_bucket = int(buckets[-1])
+        self.count += self.buffered
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index_file.close()
+
+
+def check_header(data, path):
+    magic, version, record_size = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} detection log")
+
+
+def read_index(path):
+    if not os.path.exists(index_path(path)):
+        return np.zeros(0, dtype=INDEX)
+    data = np.fromfile(index_path(path), dtype=np.uint8)
+    return data[:len(data) - len(data) % INDEX.itemsize].view(INDEX)
+
+
+class DetectionLogReader:
+    """Range queries over a detection log; results are views into an np.memmap"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            check_header(f.read(HEADER.size), path)
+        self.names = None
+        if os.path.exists(names_path(path)):
+            with open(names_path(path)) as f:
+                self.names = json.load(f)
+        self.refresh()
+
+    def refresh(self):
+        """Pick up records appended since the log was opened"""
+        count = (os.path.getsize(self.path) - HEADER.size) // RECORD.itemsize
+        self.records = (np.memmap(self.path, dtype=RECORD, mode="r", offset=HEADER.size, shape=(count,))
+                        if count else np.zeros(0, dtype=RECORD))
+        index = read_index(self.path)
+        index = index[index["record"] < count]
+        self.index_times = np.array(index["timestamp"])
+        self.index_records = np.array(index["record"], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.records)
+
+    def locate(self, timestamp):
+        """Number of the first record at or after timestamp"""
+        # Last block starting strictly before timestamp: when a block starts exactly at it,
+        # records with the same timestamp may end the previous block
+        entry = np.searchsorted(self.index_times, timestamp, side="left") - 1
+        if entry < 0:
+            return 0
+        start = self.index_records[entry]
+        end = self.index_records[entry + 1] if entry + 1 < len(self.index_records) else len(self.records)
+        return start + int(np.searchsorted(self.records["timestamp"][start:end], timestamp))
+
+    def between(self, start, end):
+        """Records with start <= timestamp < end"""
+        return self.records[self.locate(start):self.locate(end)]
+
+    def frames(self, records):
+        """Split records into (timestamp, frame, records) groups, one per frame"""
+        if not len(records):
+            return []
+        frames = np.asarray(records["frame"])
+        splits = np.flatnonzero(frames[1:] != frames[:-1]) + 1
+        return [(float(group["timestamp"][0]), int(group["frame"][0]), group)
+                for group in np.split(records, splits)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a detection log by time")
+    parser.add_argument("log")
+    parser.add_argument("--start", help="local time, e.g. '2026-10-19 14:03'; default: the first record")
+    parser.add_argument("--minutes", type=float, default=1.0)
+    args = parser.parse_args()
+
+    reader = DetectionLogReader(args.log)
+    if not len(reader):
+        print("Log is empty")
+        return
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else float(reader.records["timestamp"][0])
+    records = reader.between(start, start + args.minutes * 60)
+    frames = reader.frames(records)
+    print(f"{len(records)} detections in {len(frames)} frames from {datetime.fromtimestamp(start)} "
+          f"over {args.minutes:g} min")
+    class_ids, counts = np.unique(records["class_id"], return_counts=True)
+    for class_id, count in zip(class_ids, counts):
+        name = reader.names[class_id] if reader.names else f"class {class_id}"
+        print(f"  {name:<16} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Adaptive detection quality for ai tracking.py under CPU load.
+
+The controller keeps a moving average of inference latency. Each detection's
+cost is spread over the frames it covers and compared with the frame budget
+of the target FPS. Sustained overload moves one step down QUALITY_LEVELS:
+smaller model input, higher confidence threshold, then detecting only every
+Nth frame. Sustained headroom moves back up. Every change is printed, so
+the display slows down gradually instead of freezing.
+"""
+import time
+
+# (model input size, confidence threshold, detect every N frames), best first.
+# YOLO input sizes must be multiples of 32.
+QUALITY_LEVELS = [
+    (640, 0.50, 1),
+    (512, 0.50, 1),
+    (416, 0.55, 1),
+    (320, 0.60, 1),
+    (320, 0.60, 2),
+    (320, 0.65, 3),
+    (256, 0.65, 4),
+]
+
+
+def describe(level):
+    size, confidence, every = level
+    return f"{size}px conf {confidence:.2f} every {every}"
+
+
+class QualityController:
+    """Steps through QUALITY_LEVELS to keep per-frame inference cost within budget"""
+
+    def __init__(self, target_fps=15, levels=QUALITY_LEVELS, smoothing=0.2, patience=10, headroom=0.6):
+        self.budget = 1 / target_fps
+        self.levels = list(levels)
+        self.smoothing = smoothing
+        self.patience = patience  # Consecutive over-budget detections before stepping down
+        self.headroom = headroom  # Step back up only below this fraction of the budget
+        self.level = 0
+        self.average = None
+        self.over = 0
+        self.under = 0
+        self.changes = []  # (time, old level, new level, average latency)
+
+    @property
+    def size(self):
+        return self.levels[self.level][0]
+
+    @property
+    def confidence(self):
+        return self.levels[self.level][1]
+
+    @property
+    def every(self):
+        return self.levels[self.level][2]
+
+    def should_detect(self, frame_index):
+        return frame_index % self.every == 0
+
+    def record(self, latency):
+        """Feed one inference latency in seconds; may change the level"""
+        if self.average is None:
+            self.average = latency
+        else:
+            self.average += self.smoothing * (latency - self.average)
+
+        load = self.average / self.every
+        if load > self.budget:
+            self.over += 1
+            self.under = 0
+        elif load < self.budget * self.headroom:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+
+        if self.over >= self.patience and self.level < len(self.levels) - 1:
+            self.set_level(self.level + 1)
+        elif self.under >= 3 * self.patience and self.level > 0:
+            # Recovering is slower than degrading so the level doesn't oscillate
+            self.set_level(self.level - 1)
+
+    def set_level(self, level):
+        print(f"Detection quality: {describe(self.levels[self.level])} -> {describe(self.levels[level])} "
+              f"(inference {self.average * 1000:.0f} ms, budget {self.budget * 1000:.0f} ms/frame)")
+        self.changes.append((time.time(), self.level, level, self.average))
+        self.level = level
+        # Latency at the new level is unknown; start averaging afresh
+        self.average = None
+        self.over = self.under = 0
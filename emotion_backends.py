@@ -0,0 +1,171 @@
+"""DeepFace face-detector backends and input sizes for the emotion detector.
+
+DeepFace.analyze first finds the face with a detector backend, and the
+backends differ in speed by an order of magnitude. analyze() below is the
+one call the game makes. It uses the backend and input width saved in
+emotion_config.json, so the game runs exactly what the benchmark measured.
+
+The benchmark runs a recorded clip through every detector backend and
+width. It reports latency percentiles and how often the dominant emotion
+agrees with a reference, and saves the fastest configuration (by p90
+latency) that stays above the agreement threshold:
+
+    python emotion_backends.py face_clip.mp4 --save
+    python emotion_backends.py face_clip.mp4 --labels labels.json --threshold 0.85 --save
+
+The reference is a labels file (JSON list with one emotion or null per
+sampled frame) or else the output of --reference BACKEND:WIDTH.
+"""
+import argparse
+import json
+import os
+import time
+
+from detection_backends import percentile, read_clip
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.environ.get("EMOTION_CONFIG", os.path.join(HERE, "emotion_config.json"))
+DEFAULT_CONFIG = {"detector_backend": "opencv", "width": 0}  # DeepFace's default, frames as captured
+DETECTOR_BACKENDS = ["opencv", "ssd", "dlib", "mtcnn", "fastmtcnn", "retinaface", "mediapipe", "yolov8",
+                     "yunet", "centerface", "skip"]
+WIDTHS = [0, 480, 320, 240]  # 0 keeps the frame size
+
+
+def load_config(path=CONFIG_PATH):
+    """Saved benchmark choice, or DeepFace's defaults when there is none"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+def mirror(frame):
+    """The game shows and analyzes the camera mirrored; the benchmark must see the same input"""
+    import cv2
+    return cv2.flip(frame, 1)
+
+
+def resize(frame, width):
+    """Scale a frame down to width (keeping its aspect); 0 or a larger width leaves it as is"""
+    height, frame_width = frame.shape[:2]
+    if not width or width >= frame_width:
+        return frame
+    import cv2
+    return cv2.resize(frame, (width, round(height * width / frame_width)), interpolation=cv2.INTER_AREA)
+
+
+def analyze(DeepFace, frame, config):
+    """Emotion scores of the first face found with the configured backend and width"""
+    result = DeepFace.analyze(resize(frame, config["width"]), actions=['emotion'], enforce_detection=False,
+                              detector_backend=config["detector_backend"])
+    if isinstance(result, list):
+        result = result[0]
+    return result['emotion']
+
+
+def dominant(emotions):
+    return max(emotions, key=emotions.get).lower()
+
+
+def benchmark(DeepFace, frames, config):
+    """(sorted latencies in s, dominant emotion per frame) for one configuration"""
+    analyze(DeepFace, frames[0], config)  # Loads the detector's weights
+    latencies = []
+    labels = []
+    for frame in frames:
+        start = time.perf_counter()
+        labels.append(dominant(analyze(DeepFace, frame, config)))
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), labels
+
+
+def agreement(reference, labels):
+    """Share of labelled frames where the dominant emotion matches the reference"""
+    pairs = [(expected, label) for expected, label in zip(reference, labels) if expected]
+    return sum(expected == label for expected, label in pairs) / len(pairs) if pairs else 0.0
+
+
+def parse_config(text):
+    backend, _, width = text.partition(":")
+    return {"detector_backend": backend, "width": int(width or 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the fastest DeepFace setup that keeps emotions accurate")
+    parser.add_argument("clip", help="video of faces, e.g. recorded from the game's camera")
+    parser.add_argument("--backends", nargs="+", default=DETECTOR_BACKENDS, choices=DETECTOR_BACKENDS)
+    parser.add_argument("--widths", nargs="+", type=int, default=WIDTHS, help="input widths; 0 keeps the frame size")
+    parser.add_argument("--frames", type=int, default=60, help="frames to analyze")
+    parser.add_argument("--every", type=int, default=5, help="analyze every n-th frame of the clip")
+    parser.add_argument("--labels", help="JSON list of the true emotion (or null) for each analyzed frame")
+    parser.add_argument("--reference", default="retinaface:0", metavar="BACKEND:WIDTH",
+                        help="configuration whose output is the reference when there are no labels")
+    parser.add_argument("--threshold", type=float, default=0.9, help="minimum agreement with the reference")
+    parser.add_argument("--out", help="write every result as JSON")
+    parser.add_argument("--save", nargs="?", const=CONFIG_PATH, metavar="PATH",
+                        help=f"save the chosen configuration for the game (default {CONFIG_PATH})")
+    args = parser.parse_args()
+
+    from deepface import DeepFace
+    frames = [mirror(frame) for frame in read_clip(args.clip, args.frames * args.every)[::args.every]]
+    if not frames:
+        print(f"Could not read frames from {args.clip}")
+        return
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    if args.labels:
+        with open(args.labels) as f:
+            reference = [label.lower() if label else None for label in json.load(f)][:len(frames)]
+        print(f"Reference: {sum(label is not None for label in reference)} labelled frames from {args.labels}")
+    else:
+        config = parse_config(args.reference)
+        try:
+            _, reference = benchmark(DeepFace, frames, config)
+        except Exception as e:
+            print(f"Reference {args.reference} failed ({e}); pass --labels or another --reference")
+            return
+        print(f"Reference: {config['detector_backend']} at width {config['width'] or 'native'}")
+
+    results = []
+    frame_width = frames[0].shape[1]
+    for backend in args.backends:
+        # Widths at or above the frame size all mean "as captured"; run that only once
+        widths = sorted({width if width and width < frame_width else 0 for width in args.widths})
+        for width in widths:
+            config = {"detector_backend": backend, "width": width}
+            try:
+                latencies, labels = benchmark(DeepFace, frames, config)
+            except Exception as e:
+                # Most backends need an optional package (dlib, mediapipe, ...)
+                print(f"{backend}: skipped ({e})")
+                break
+            result = dict(config, agreement=agreement(reference, labels),
+                          latency_ms={key: percentile(latencies, fraction) * 1000
+                                      for key, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))})
+            results.append(result)
+            latency = result["latency_ms"]
+            print(f"{backend:<12} {width or 'native':>6}  p50 {latency['p50']:8.1f}  p90 {latency['p90']:8.1f}  "
+                  f"p99 {latency['p99']:8.1f} ms  agreement {result['agreement']:.1%}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"clip": args.clip, "frames": len(frames), "threshold": args.threshold, "results": results},
+                      f, indent=2)
+        print(f"Wrote {args.out}")
+
+    accurate = [result for result in results if result["agreement"] >= args.threshold]
+    if not accurate:
+        print(f"No configuration reached {args.threshold:.0%} agreement; keeping the current default")
+        return
+    best = min(accurate, key=lambda result: result["latency_ms"]["p90"])
+    print(f"Fastest above {args.threshold:.0%}: {best['detector_backend']} at width {best['width'] or 'native'} "
+          f"(p90 {best['latency_ms']['p90']:.1f} ms, agreement {best['agreement']:.1%})")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(dict(best, clip=os.path.basename(args.clip)), f, indent=2)
+        print(f"Saved as the game default in {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import pygame
 import random
+import struct
 import sys
-
-# Initialize Pygame
-pygame.init()
+from collision import hits_box, sprite_mask
+from profiler import FrameProfiler
+from rendering import DirtyScreen, get_events, init_subsystems, load_font, needs_repaint
+from snapshot import pack_rng, pack_values, unpack_rng, unpack_values
 
 # Game constants
 SCREEN_WIDTH = 400
@@ -14,6 +16,11 @@ PIPE_WIDTH = 80
 PIPE_GAP = 200
 PIPE_SPEED = 3
 BIRD_SIZE = 30
+DIRTY_RECTS = True  # Only push changed regions to the display
+
+# frame, score, pipe_timer, game_over, bird y, bird velocity, pipe count
+SNAPSHOT_HEADER = struct.Struct("<IiiBddH")
+PIPE_FIELDS = 3  # x, gap_y, passed
 
 # Colors
 WHITE = (255, 255, 255)
@@ -25,6 +32,8 @@ RED = (255, 0, 0)
 
 
 class Bird:
+    __slots__ = ("x", "y", "velocity", "rect")
+
     def __init__(self):
         self.x = 50
         self.y = SCREEN_HEIGHT // 2
@@ -48,17 +57,23 @@ class Bird:
             self.velocity = 0
 
     def draw(self, screen):
-        pygame.draw.circle(screen, YELLOW, (int(self.x + BIRD_SIZE // 2), int(self.y + BIRD_SIZE // 2)), BIRD_SIZE // 2)
+        rect = pygame.draw.circle(screen, YELLOW, (int(self.x + BIRD_SIZE // 2), int(self.y + BIRD_SIZE // 2)), BIRD_SIZE // 2)
         pygame.draw.circle(screen, BLACK, (int(self.x + BIRD_SIZE // 2), int(self.y + BIRD_SIZE // 2)), BIRD_SIZE // 2,
                            2)
         # Eye
         pygame.draw.circle(screen, BLACK, (int(self.x + BIRD_SIZE // 2 + 5), int(self.y + BIRD_SIZE // 2 - 5)), 3)
+        return rect
+
+    def get_mask(self):
+        return sprite_mask("bird", (BIRD_SIZE, BIRD_SIZE), Bird)
 
 
 class Pipe:
-    def __init__(self, x):
+    __slots__ = ("x", "gap_y", "top_rect", "bottom_rect", "passed")
+
+    def __init__(self, x, rng=random, gap_y=None):
         self.x = x
-        self.gap_y = random.randint(150, SCREEN_HEIGHT - 150 - PIPE_GAP)
+        self.gap_y = rng.randint(150, SCREEN_HEIGHT - 150 - PIPE_GAP) if gap_y is None else gap_y
         self.top_rect = pygame.Rect(x, 0, PIPE_WIDTH, self.gap_y)
         self.bottom_rect = pygame.Rect(x, self.gap_y + PIPE_GAP, PIPE_WIDTH, SCREEN_HEIGHT - (self.gap_y + PIPE_GAP))
         self.passed = False
@@ -73,25 +88,50 @@ class Pipe:
         pygame.draw.rect(screen, GREEN, self.bottom_rect)
         pygame.draw.rect(screen, BLACK, self.top_rect, 3)
         pygame.draw.rect(screen, BLACK, self.bottom_rect, 3)
+        return self.top_rect.union(self.bottom_rect)
 
     def collides_with(self, bird):
-        return bird.rect.colliderect(self.top_rect) or bird.rect.colliderect(self.bottom_rect)
+        # Broadphase on x alone; the pipes are solid, so only the round bird needs a mask
+        if self.x >= bird.rect.right or self.x + PIPE_WIDTH <= bird.rect.x:
+            return False
+        mask = bird.get_mask()
+        return (hits_box(bird.rect.x, bird.rect.y, mask, *self.top_rect)
+                or hits_box(bird.rect.x, bird.rect.y, mask, *self.bottom_rect))
 
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Flappy Bird")
+    # Game.observe() values, matching FlappyVecEnv observations
+    STATE_FIELDS = ("bird_y", "bird_velocity", "pipe_dx", "pipe_gap_y")
+
+    def __init__(self, headless=False, seed=None):
+        self.headless = headless
+        init_subsystems()
+        # All gameplay randomness comes from one seeded generator so sessions can be replayed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.recorder = None
+        self.dataset = None  # dataset_recorder.DatasetRecorder while recording training data
+        self.frame = 0
+        if headless:
+            # Offscreen target: no window is opened and draw() only runs when asked
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Flappy Bird")
         self.clock = pygame.time.Clock()
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert(self.screen)
+        background.fill(BLUE)
+        self.dirty = DirtyScreen(self.screen, background, DIRTY_RECTS, display=not headless)
+        self.profiler = FrameProfiler("flappy", ["events", "update", "draw", "present", "tick"])
         self.bird = Bird()
         self.pipes = []
         self.score = 0
-        self.font = pygame.font.Font(None, 36)
+        self.font = load_font(36)
         self.game_over = False
         self.pipe_timer = 0
 
     def create_pipe(self):
-        self.pipes.append(Pipe(SCREEN_WIDTH))
+        self.pipes.append(Pipe(SCREEN_WIDTH, self.rng))
 
     def update(self):
         if not self.game_over:
@@ -124,9 +164,37 @@ class Game:
             if self.bird.y <= 0 or self.bird.y >= SCREEN_HEIGHT - BIRD_SIZE:
                 self.game_over = True
 
+            self.frame += 1
+
+    def press_space(self):
+        if self.recorder:
+            self.recorder.space(self.frame)
+        if self.dataset:
+            self.dataset.press()
+        if self.game_over:
+            self.restart()
+            self.dirty.invalidate()
+        else:
+            self.bird.jump()
+
+    def step(self, flap=False):
+        """Advance the simulation by one tick, flapping first if asked (headless input)"""
+        if flap and not self.game_over:
+            self.bird.jump()
+        self.update()
+
+    def observe(self):
+        """Bird y, velocity, distance to the next pipe and that pipe's gap y"""
+        bird = self.bird
+        ahead = [pipe for pipe in self.pipes if pipe.x + PIPE_WIDTH >= bird.x]
+        if not ahead:
+            return bird.y, bird.velocity, SCREEN_WIDTH - bird.x, (SCREEN_HEIGHT - PIPE_GAP) // 2
+        pipe = min(ahead, key=lambda pipe: pipe.x)
+        return bird.y, bird.velocity, pipe.x - bird.x, pipe.gap_y
+
     def draw(self):
-        # Draw background
-        self.screen.fill(BLUE)
+        # Restore background under last frame's sprites
+        self.dirty.clear()
 
         # Draw clouds
         for i in range(3):
@@ -134,17 +202,18 @@ class Game:
             pygame.draw.circle(self.screen, WHITE, (cloud_x, 100), 30)
             pygame.draw.circle(self.screen, WHITE, (cloud_x + 25, 100), 25)
             pygame.draw.circle(self.screen, WHITE, (cloud_x - 25, 100), 25)
+            self.dirty.mark((cloud_x - 50, 70, 100, 60))
 
         # Draw pipes
         for pipe in self.pipes:
-            pipe.draw(self.screen)
+            self.dirty.mark(pipe.draw(self.screen))
 
         # Draw bird
-        self.bird.draw(self.screen)
+        self.dirty.mark(self.bird.draw(self.screen))
 
         # Draw score
         score_text = self.font.render(f"Score: {self.score}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
+        self.dirty.mark(self.screen.blit(score_text, (10, 10)))
 
         # Draw game over screen
         if self.game_over:
@@ -154,10 +223,8 @@ class Game:
             game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
             restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
 
-            self.screen.blit(game_over_text, game_over_rect)
-            self.screen.blit(restart_text, restart_rect)
-
-        pygame.display.flip()
+            self.dirty.mark(self.screen.blit(game_over_text, game_over_rect))
+            self.dirty.mark(self.screen.blit(restart_text, restart_rect))
 
     def restart(self):
         self.bird = Bird()
@@ -166,25 +233,68 @@ class Game:
         self.game_over = False
         self.pipe_timer = 0
 
+    def snapshot(self):
+        """Pack the whole simulation state, RNG included, into bytes"""
+        pipes = []
+        for pipe in self.pipes:
+            pipes += (pipe.x, pipe.gap_y, pipe.passed)
+        header = SNAPSHOT_HEADER.pack(self.frame, self.score, self.pipe_timer, self.game_over,
+                                      self.bird.y, self.bird.velocity, len(self.pipes))
+        return header + pack_values(pipes) + pack_rng(self.rng)
+
+    def restore(self, data):
+        """Return to a state produced by snapshot()"""
+        (self.frame, self.score, self.pipe_timer, game_over,
+         self.bird.y, self.bird.velocity, count) = SNAPSHOT_HEADER.unpack_from(data)
+        self.game_over = bool(game_over)
+        self.bird.rect.y = self.bird.y
+        values, offset = unpack_values(data, SNAPSHOT_HEADER.size, count * PIPE_FIELDS)
+        self.pipes = []
+        for i in range(0, len(values), PIPE_FIELDS):
+            pipe = Pipe(int(values[i]), gap_y=int(values[i + 1]))
+            pipe.passed = bool(values[i + 2])
+            self.pipes.append(pipe)
+        unpack_rng(self.rng, data, offset)
+
     def run(self):
         running = True
+        needs_redraw = True
         while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            self.profiler.begin_frame()
+            # The game over screen is static: draw it once, then sleep until input
+            for event in get_events(block=self.game_over and not needs_redraw):
+                if needs_repaint(event):
+                    self.dirty.invalidate()
+                    needs_redraw = True
+                elif event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_SPACE:
-                        if self.game_over:
-                            self.restart()
-                        else:
-                            self.bird.jump()
+                        self.press_space()
+                    elif event.key == pygame.K_F3:
+                        self.profiler.toggle()
                     elif event.key == pygame.K_ESCAPE:
                         running = False
+            self.profiler.mark("events")
+
+            if self.game_over and not needs_redraw:
+                continue
 
             self.update()
+            self.profiler.mark("update")
             self.draw()
+            if self.dataset:
+                self.dataset.record(self.screen, self.frame, self.score, self.game_over, self.observe())
+            self.dirty.mark(self.profiler.draw(self.screen))
+            self.profiler.mark("draw")
+            self.dirty.present()
+            self.profiler.mark("present")
+            needs_redraw = not self.game_over
             self.clock.tick(60)
+            self.profiler.mark("tick")
+            self.profiler.end_frame()
 
+        self.profiler.dump_csv()
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,163 @@
+"""Flappy Bird autopilot backed by a precomputed reachability table.
+
+For every (pipe position, bird height relative to the gap, velocity) state the
+table stores which of no-flap / flap keep the bird able to get through the
+current pipe. It is built once by backward induction over the game's exact
+integer physics, cached on disk, and each decision is then a single lookup.
+
+Usage:
+    python flappy_autopilot.py              # build (or load) the table and evaluate it
+    python headless.py flappy --autopilot   # use it as the headless reference agent
+"""
+import os
+import time
+import zlib
+
+import numpy as np
+
+from flappy_vec_env import (BIRD_SIZE, BIRD_X, GAP_MAX, GAP_MIN, GRAVITY, JUMP_STRENGTH, PIPE_GAP,
+                            PIPE_SPEED, PIPE_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, FlappyVecEnv)
+
+# Positions and velocities are multiples of GRAVITY = 0.5, so the table works
+# in half pixels
+HALF = 2
+FIRST_PIPE_X = SCREEN_WIDTH - PIPE_SPEED  # Pipes are first seen after one update
+LAST_PIPE_X = BIRD_X - PIPE_WIDTH + 1  # Last x before the pipe counts as passed
+NUM_X = (FIRST_PIPE_X - LAST_PIPE_X) // PIPE_SPEED + 1
+
+# Relative height range in which the bird can be alive for any gap_y
+DY_MIN = -GAP_MIN * HALF  # y <= 0 for the highest gap
+DY_MAX = (SCREEN_HEIGHT - BIRD_SIZE - GAP_MAX) * HALF  # y >= floor for the lowest gap
+NUM_DY = DY_MAX - DY_MIN + 1
+V_MIN = int(JUMP_STRENGTH * HALF)
+V_MAX = 50  # 25 px/frame; faster than any fall inside the playfield
+NUM_V = V_MAX - V_MIN + 1
+
+NO_FLAP = 1
+FLAP = 2
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def cache_path():
+    # The physics constants are part of the name so a change rebuilds the table
+    key = repr((SCREEN_WIDTH, SCREEN_HEIGHT, GRAVITY, JUMP_STRENGTH, PIPE_WIDTH, PIPE_GAP,
+                PIPE_SPEED, BIRD_SIZE, BIRD_X, GAP_MIN, GAP_MAX, V_MAX))
+    return os.path.join(CACHE_DIR, f"flappy_reachability_{zlib.crc32(key.encode()):08x}.npy")
+
+
+def build_table():
+    """Backward induction from the pipe being passed to it being first seen
+
+    table[x_index, dy - DY_MIN, v - V_MIN] holds NO_FLAP and/or FLAP bits for
+    the actions after which the bird can still pass the pipe. dy is
+    2 * (y - gap_y) and v is 2 * velocity, both before the action.
+    """
+    table = np.zeros((NUM_X, NUM_DY, NUM_V), dtype=np.uint8)
+    dy = np.arange(DY_MIN, DY_MAX + 1)[:, None]
+    v = np.arange(V_MIN, V_MAX + 1)[None, :]
+    gravity = int(GRAVITY * HALF)
+    # Rect rounding: the bird hits the top pipe when round(y) < gap_y and the
+    # bottom one when round(y) + BIRD_SIZE > gap_y + PIPE_GAP
+    top_hit = -HALF
+    bottom_hit = (PIPE_GAP - BIRD_SIZE + 1) * HALF - 1
+
+    survivable = None
+    for index in range(NUM_X - 1, -1, -1):
+        next_x = FIRST_PIPE_X - index * PIPE_SPEED - PIPE_SPEED
+        overlaps = BIRD_X - PIPE_WIDTH < next_x < BIRD_X + BIRD_SIZE
+        for bit, new_v in ((NO_FLAP, v + gravity), (FLAP, np.full_like(v, V_MIN) + gravity)):
+            new_dy = dy + new_v
+            alive = (new_dy > DY_MIN) & (new_dy < DY_MAX)
+            if overlaps:
+                alive &= (new_dy > top_hit) & (new_dy < bottom_hit)
+            if survivable is None:
+                # Just passed: also require being level with the gap, so the
+                # next pipe is reachable whatever its height
+                ok = alive & (new_dy >= 0) & (new_dy < bottom_hit)
+            else:
+                dy_index = np.clip(new_dy - DY_MIN, 0, NUM_DY - 1)
+                v_index = np.clip(new_v - V_MIN, 0, NUM_V - 1)
+                ok = alive & survivable[dy_index, np.broadcast_to(v_index, dy_index.shape)]
+            table[index] |= (ok * bit).astype(np.uint8)
+        survivable = table[index] != 0
+    return table
+
+
+def load_table(path=None, rebuild=False):
+    path = path or cache_path()
+    if not rebuild and os.path.exists(path):
+        return np.load(path)
+    table = build_table()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, table)
+    return table
+
+
+class Autopilot:
+    """Chooses flap/no-flap by table lookup; prefers not flapping when both are safe"""
+
+    def __init__(self, table=None):
+        self.table = load_table() if table is None else table
+
+    def choices(self, pipe_x, y, velocity, gap_y):
+        index = min(max((FIRST_PIPE_X - pipe_x) // PIPE_SPEED, 0), NUM_X - 1)
+        dy = int(round((y - gap_y) * HALF)) - DY_MIN
+        v = min(max(int(round(velocity * HALF)), V_MIN), V_MAX) - V_MIN
+        if not 0 <= dy < NUM_DY:
+            return 0
+        return self.table[index, dy, v]
+
+    def decide(self, pipe_x, y, velocity, gap_y):
+        choices = self.choices(pipe_x, y, velocity, gap_y)
+        if choices & NO_FLAP:
+            return False
+        if choices & FLAP:
+            return True
+        # No survivable action: flap when below the middle of the gap
+        return y > gap_y + (PIPE_GAP - BIRD_SIZE) / 2
+
+    def decide_game(self, game):
+        """Decision for a flappy bird.py Game instance"""
+        bird = game.bird
+        ahead = [pipe for pipe in game.pipes if pipe.x + PIPE_WIDTH >= bird.x]
+        if ahead:
+            pipe = min(ahead, key=lambda pipe: pipe.x)
+            return self.decide(pipe.x, bird.y, bird.velocity, pipe.gap_y)
+        return self.decide(FIRST_PIPE_X, bird.y, bird.velocity, (GAP_MIN + GAP_MAX) // 2)
+
+    def act(self, obs):
+        """Batched decisions for FlappyVecEnv observations"""
+        pipe_x = obs[:, 2].astype(np.int64) + BIRD_X
+        index = np.clip((FIRST_PIPE_X - pipe_x) // PIPE_SPEED, 0, NUM_X - 1)
+        dy = np.rint((obs[:, 0] - obs[:, 3]) * HALF).astype(np.int64) - DY_MIN
+        v = np.clip(np.rint(obs[:, 1] * HALF).astype(np.int64), V_MIN, V_MAX) - V_MIN
+        inside = (dy >= 0) & (dy < NUM_DY)
+        choices = np.where(inside, self.table[index, np.clip(dy, 0, NUM_DY - 1), v], 0)
+        fallback = obs[:, 0] > obs[:, 3] + (PIPE_GAP - BIRD_SIZE) / 2
+        return np.where(choices & NO_FLAP, False, np.where(choices & FLAP, True, fallback))
+
+
+def main():
+    start = time.perf_counter()
+    rebuild = not os.path.exists(cache_path())
+    table = load_table()
+    print(f"{'Built' if rebuild else 'Loaded'} {table.shape} table "
+          f"({table.nbytes / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+
+    autopilot = Autopilot(table)
+    env = FlappyVecEnv(1024, seed=0)
+    obs = env.reset()
+    steps = 5000
+    deaths = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        obs, _, dones = env.step(autopilot.act(obs))
+        deaths += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{env.num_envs * steps / elapsed / 1e6:.1f}M decisions+steps/s, "
+          f"{deaths} deaths in {env.num_envs * steps} steps, mean score {env.score.mean():.1f}")
+
+
+if __name__ == "__main__":
+    main()
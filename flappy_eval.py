@@ -0,0 +1,188 @@
+"""Parallel evaluation of Flappy Bird autopilot policies.
+
+Policies are linear: the bird flaps when features . weights > 0, with the
+features ((bird y - gap y) / 100, velocity / 10, distance to pipe / 100, 1). Every policy plays
+the same seeded pipe layouts, headlessly, in a process pool. Workers write
+their results straight into shared-memory arrays, so the only per-task IPC
+is a pair of indices.
+
+Usage:
+    python flappy_eval.py --policies 2000 --layouts 32 --workers 8 --seed 0
+    python flappy_eval.py --weights population.npy --save results.npz
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory, util
+
+import numpy as np
+
+from flappy_vec_env import GAP_MAX, GAP_MIN, PIPE_INTERVAL, FlappyVecEnv
+
+NUM_FEATURES = 4
+PIPES_PER_LAYOUT = 64
+
+# Per-worker state, set once by init_worker
+_worker = {}
+
+
+def make_layouts(num_layouts, seed, pipes=PIPES_PER_LAYOUT):
+    """Pipe gap sequences, identical for a given seed"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(GAP_MIN, GAP_MAX + 1, size=(num_layouts, pipes), dtype=np.int32)
+
+
+def random_population(num_policies, seed):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(num_policies, NUM_FEATURES)).astype(np.float32)
+
+
+def policy_features(obs):
+    features = np.empty((len(obs), NUM_FEATURES), dtype=np.float32)
+    features[:, 0] = (obs[:, 0] - obs[:, 3]) / 100
+    features[:, 1] = obs[:, 1] / 10
+    features[:, 2] = obs[:, 2] / 100
+    features[:, 3] = 1.0
+    return features
+
+
+def evaluate(weights, layouts, max_steps):
+    """Play every policy on every layout once; returns (scores, steps) arrays
+
+    Runs in the calling process. Each (policy, layout) pair is one environment
+    of a single vectorized batch, and each pair's first episode is its result.
+    """
+    num_policies, num_layouts = len(weights), len(layouts)
+    env_weights = np.repeat(weights, num_layouts, axis=0)
+    env = FlappyVecEnv(num_policies * num_layouts, layouts=np.tile(layouts, (num_policies, 1)))
+
+    scores = np.zeros(env.num_envs, dtype=np.int32)
+    steps = np.full(env.num_envs, max_steps, dtype=np.int32)
+    running = np.ones(env.num_envs, dtype=bool)
+    obs = env.reset()
+    for _ in range(max_steps):
+        flap = (policy_features(obs) * env_weights).sum(axis=1) > 0
+        obs, _, dones = env.step(flap)
+        finished = dones & running
+        if finished.any():
+            scores[finished] = env.final_scores[finished]
+            steps[finished] = env.final_steps[finished]
+            running &= ~dones
+            if not running.any():
+                break
+    scores[running] = env.score[running]
+    return scores.reshape(num_policies, num_layouts), steps.reshape(num_policies, num_layouts)
+
+
+def init_worker(weights, layouts, max_steps, scores_name, steps_name):
+    shape = (len(weights), len(layouts))
+    scores_shm = shared_memory.SharedMemory(name=scores_name)
+    steps_shm = shared_memory.SharedMemory(name=steps_name)
+    _worker.update(
+        weights=weights,
+        layouts=layouts,
+        max_steps=max_steps,
+        shm=(scores_shm, steps_shm),
+        scores=np.ndarray(shape, dtype=np.int32, buffer=scores_shm.buf),
+        steps=np.ndarray(shape, dtype=np.int32, buffer=steps_shm.buf),
+    )
+    # Pool workers skip atexit; multiprocessing runs this as the worker exits cleanly
+    util.Finalize(None, close_worker, exitpriority=10)
+
+
+def close_worker():
+    """Detach this worker from the shared result arrays"""
+    # The array views must go first, or close() fails with exported buffers
+    _worker.pop("scores", None)
+    _worker.pop("steps", None)
+    for shm in _worker.pop("shm", ()):
+        shm.close()
+
+
+def evaluate_shard(bounds):
+    start, stop = bounds
+    scores, steps = evaluate(_worker["weights"][start:stop], _worker["layouts"], _worker["max_steps"])
+    _worker["scores"][start:stop] = scores
+    _worker["steps"][start:stop] = steps
+    return stop - start
+
+
+def evaluate_population(weights, num_layouts=16, seed=0, workers=None, max_steps=None, shard_size=64):
+    """Evaluate a population of policies in parallel
+
+    Returns a dict of arrays: per-(policy, layout) scores and survival steps,
+    plus per-policy mean score, min score and mean survival. Results depend
+    only on the weights and the seed, not on the worker count or sharding.
+    """
+    weights = np.ascontiguousarray(weights, dtype=np.float32)
+    layouts = make_layouts(num_layouts, seed)
+    if max_steps is None:
+        max_steps = PIPE_INTERVAL * (layouts.shape[1] + 1)
+    workers = workers or os.cpu_count()
+    shape = (len(weights), num_layouts)
+
+    nbytes = max(1, int(np.prod(shape)) * 4)
+    scores_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    steps_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        shards = [(i, min(i + shard_size, len(weights))) for i in range(0, len(weights), shard_size)]
+        with mp.Pool(workers, initializer=init_worker,
+                     initargs=(weights, layouts, max_steps, scores_shm.name, steps_shm.name)) as pool:
+            for _ in pool.imap_unordered(evaluate_shard, shards):
+                pass
+            # Let workers exit on their own (and detach) instead of being terminated
+            pool.close()
+            pool.join()
+        scores = np.ndarray(shape, dtype=np.int32, buffer=scores_shm.buf).copy()
+        steps = np.ndarray(shape, dtype=np.int32, buffer=steps_shm.buf).copy()
+    finally:
+        scores_shm.close()
+        scores_shm.unlink()
+        steps_shm.close()
+        steps_shm.unlink()
+
+    return {
+        "scores": scores,
+        "steps": steps,
+        "mean_score": scores.mean(axis=1),
+        "min_score": scores.min(axis=1),
+        "mean_survival": steps.mean(axis=1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate Flappy Bird policies in a process pool")
+    parser.add_argument("--weights", help=".npy file with an (N, 4) array of policy weights")
+    parser.add_argument("--policies", type=int, default=1000, help="random policies when no --weights")
+    parser.add_argument("--layouts", type=int, default=16, help="seeded pipe layouts per policy (at least 1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--save", help="write all result arrays to this .npz file")
+    args = parser.parse_args()
+    if args.layouts < 1:
+        parser.error("--layouts must be at least 1")
+
+    if args.weights:
+        weights = np.load(args.weights)
+    else:
+        weights = random_population(args.policies, args.seed)
+
+    start = time.perf_counter()
+    results = evaluate_population(weights, args.layouts, args.seed, args.workers, args.max_steps)
+    elapsed = time.perf_counter() - start
+
+    games = results["scores"].size
+    print(f"Evaluated {len(weights)} policies x {args.layouts} layouts in {elapsed:.2f}s "
+          f"({games / elapsed:.0f} games/s, {results['steps'].sum() / elapsed / 1e6:.1f}M steps/s)")
+    best = np.lexsort((-results["mean_survival"], -results["mean_score"]))[:5]
+    for i in best:
+        print(f"  policy {i}: mean score {results['mean_score'][i]:.2f}, "
+              f"min {results['min_score'][i]}, mean survival {results['mean_survival'][i]:.0f} frames")
+    if args.save:
+        np.savez(args.save, weights=weights, **results)
+
+
+if __name__ == "__main__":
+    main()
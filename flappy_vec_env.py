@@ -0,0 +1,200 @@
+"""NumPy-vectorized Flappy Bird: steps many independent birds in lockstep.
+
+The physics, spawn timing and collision rules match Game.update in
+flappy bird.py tick for tick, so agents trained here behave the same in the
+real game. Pixel-accurate bird/pipe hits come from two small lookup tables
+built once from the bird's mask. Example:
+
+    env = FlappyVecEnv(4096, seed=0)
+    obs = env.reset()
+    obs, rewards, dones = env.step(policy(obs))
+"""
+import time
+
+import numpy as np
+
+# Same values as flappy bird.py
+SCREEN_WIDTH = 400
+SCREEN_HEIGHT = 600
+GRAVITY = 0.5
+JUMP_STRENGTH = -10
+PIPE_WIDTH = 80
+PIPE_GAP = 200
+PIPE_SPEED = 3
+BIRD_SIZE = 30
+BIRD_X = 50
+PIPE_INTERVAL = 90  # Frames between pipes
+GAP_MIN = 150
+GAP_MAX = SCREEN_HEIGHT - 150 - PIPE_GAP
+
+# A pipe lives (SCREEN_WIDTH + PIPE_WIDTH) / PIPE_SPEED = 160 frames, so at
+# most two are on screen at once
+MAX_PIPES = 2
+
+OBSERVATION_SIZE = 4  # bird y, velocity, next pipe dx, next pipe gap y
+
+
+def bird_mask():
+    """The bird's silhouette as Bird.draw paints it, as a (row, column) bool array"""
+    import pygame
+    surface = pygame.Surface((BIRD_SIZE, BIRD_SIZE), pygame.SRCALPHA)
+    pygame.draw.circle(surface, (255, 255, 0), (BIRD_SIZE // 2, BIRD_SIZE // 2), BIRD_SIZE // 2)
+    return pygame.surfarray.array_alpha(surface).T > 127  # pygame.mask's default threshold
+
+
+def hit_tables(mask):
+    """Pipe hit lookups indexed by [pipe_x - BIRD_X + PIPE_WIDTH - 1, rows].
+
+    top[i, k] is True when the bird's first k rows touch a pipe at that
+    offset; bottom[i, m] when its rows from m on do.
+    """
+    offsets = range(1 - PIPE_WIDTH, BIRD_SIZE)
+    top = np.zeros((len(offsets), BIRD_SIZE + 1), dtype=bool)
+    bottom = np.zeros((len(offsets), BIRD_SIZE + 1), dtype=bool)
+    for i, dx in enumerate(offsets):
+        rows = mask[:, max(dx, 0):min(dx + PIPE_WIDTH, BIRD_SIZE)].any(axis=1)
+        top[i, 1:] = np.logical_or.accumulate(rows)
+        bottom[i, :-1] = np.logical_or.accumulate(rows[::-1])[::-1]
+    return top, bottom
+
+
+class FlappyVecEnv:
+    """Batch of Flappy Bird games with a batched action/observation/reward API.
+
+    actions: bool array (num_envs,), True to flap.
+    observations: float32 array (num_envs, 4) with bird y, bird velocity,
+        horizontal distance to the next pipe and that pipe's gap_y.
+    rewards: +1 per pipe passed, -1 on death.
+    Environments that die are reset automatically; the returned observation
+    is then the first one of the new episode and final_scores holds the score
+    of the episode that just ended.
+
+    layouts optionally fixes the pipe gaps: an int array (num_envs, L) whose
+    row i lists the gap_y of each pipe environment i will see (cycled).
+    """
+
+    def __init__(self, num_envs, seed=None, layouts=None):
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+        self.layouts = None if layouts is None else np.asarray(layouts, dtype=np.int32)
+        if self.layouts is not None and self.layouts.shape[0] != num_envs:
+            raise ValueError("layouts must have one row per environment")
+
+        self.y = np.zeros(num_envs, dtype=np.float64)
+        self.velocity = np.zeros(num_envs, dtype=np.float64)
+        self.pipe_timer = np.zeros(num_envs, dtype=np.int32)
+        self.pipe_count = np.zeros(num_envs, dtype=np.int64)
+        self.pipe_x = np.zeros((num_envs, MAX_PIPES), dtype=np.int32)
+        self.gap_y = np.zeros((num_envs, MAX_PIPES), dtype=np.int32)
+        self.active = np.zeros((num_envs, MAX_PIPES), dtype=bool)
+        self.passed = np.zeros((num_envs, MAX_PIPES), dtype=bool)
+        self.score = np.zeros(num_envs, dtype=np.int32)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.final_scores = np.zeros(num_envs, dtype=np.int32)
+        self.final_steps = np.zeros(num_envs, dtype=np.int64)
+        self.hit_top, self.hit_bottom = hit_tables(bird_mask())
+        self.reset()
+
+    def reset(self, mask=None):
+        """Reset all environments, or only those where mask is True"""
+        if mask is None:
+            mask = slice(None)
+        self.y[mask] = SCREEN_HEIGHT // 2
+        self.velocity[mask] = 0
+        self.pipe_timer[mask] = 0
+        self.pipe_count[mask] = 0
+        self.active[mask] = False
+        self.passed[mask] = False
+        self.score[mask] = 0
+        self.steps[mask] = 0
+        return self.observe()
+
+    def next_gaps(self, envs):
+        if self.layouts is None:
+            return self.rng.integers(GAP_MIN, GAP_MAX + 1, size=len(envs))
+        columns = self.pipe_count[envs] % self.layouts.shape[1]
+        return self.layouts[envs, columns]
+
+    def observe(self):
+        # Next pipe is the nearest one the bird has not yet passed
+        ahead = self.active & (self.pipe_x + PIPE_WIDTH >= BIRD_X)
+        distance = np.where(ahead, self.pipe_x - BIRD_X, np.iinfo(np.int32).max)
+        nearest = distance.argmin(axis=1)
+        rows = np.arange(self.num_envs)
+        has_pipe = ahead[rows, nearest]
+
+        obs = np.empty((self.num_envs, OBSERVATION_SIZE), dtype=np.float32)
+        obs[:, 0] = self.y
+        obs[:, 1] = self.velocity
+        obs[:, 2] = np.where(has_pipe, distance[rows, nearest], SCREEN_WIDTH - BIRD_X)
+        obs[:, 3] = np.where(has_pipe, self.gap_y[rows, nearest], (GAP_MIN + GAP_MAX) // 2)
+        return obs
+
+    def step(self, actions):
+        flap = np.asarray(actions, dtype=bool)
+
+        # Bird.update
+        self.velocity[flap] = JUMP_STRENGTH
+        self.velocity += GRAVITY
+        self.y += self.velocity
+        # Bird.rect follows the unclamped y, rounded the way pygame.Rect does
+        rect_y = np.copysign(np.floor(np.abs(self.y) + 0.5), self.y)
+        clamped = (self.y < 0) | (self.y > SCREEN_HEIGHT - BIRD_SIZE)
+        np.clip(self.y, 0, SCREEN_HEIGHT - BIRD_SIZE, out=self.y)
+        self.velocity[clamped] = 0
+
+        # Pipe spawning
+        self.pipe_timer += 1
+        spawn = np.flatnonzero(self.pipe_timer >= PIPE_INTERVAL)
+        if spawn.size:
+            slot = self.pipe_count[spawn] % MAX_PIPES
+            self.pipe_x[spawn, slot] = SCREEN_WIDTH
+            self.gap_y[spawn, slot] = self.next_gaps(spawn)
+            self.active[spawn, slot] = True
+            self.passed[spawn, slot] = False
+            self.pipe_count[spawn] += 1
+            self.pipe_timer[spawn] = 0
+
+        # Pipe.update and Pipe.collides_with
+        self.pipe_x -= PIPE_SPEED
+        # Pipes reaching past the screen edges are ignored: a bird that far out
+        # is already dead from the ground/ceiling check
+        ry = rect_y.astype(np.int64)[:, None]
+        overlap_x = self.active & (self.pipe_x > BIRD_X - PIPE_WIDTH) & (self.pipe_x < BIRD_X + BIRD_SIZE)
+        offset = np.clip(self.pipe_x - BIRD_X + PIPE_WIDTH - 1, 0, self.hit_top.shape[0] - 1)
+        rows_above = np.clip(self.gap_y - ry, 0, BIRD_SIZE)
+        rows_from = np.clip(self.gap_y + PIPE_GAP - ry, 0, BIRD_SIZE)
+        hit_pipe = self.hit_top[offset, rows_above] | self.hit_bottom[offset, rows_from]
+        hit = (overlap_x & hit_pipe).any(axis=1)
+
+        # Scoring and off-screen removal
+        newly_passed = self.active & ~self.passed & (self.pipe_x + PIPE_WIDTH < BIRD_X)
+        self.passed |= newly_passed
+        gained = newly_passed.sum(axis=1)
+        self.score += gained
+        self.active &= self.pipe_x + PIPE_WIDTH >= 0
+        self.steps += 1
+
+        dones = hit | (self.y <= 0) | (self.y >= SCREEN_HEIGHT - BIRD_SIZE)
+        rewards = gained.astype(np.float32) - dones
+        if dones.any():
+            self.final_scores[dones] = self.score[dones]
+            self.final_steps[dones] = self.steps[dones]
+            return self.reset(dones), rewards, dones
+        return self.observe(), rewards, dones
+
+
+def benchmark(num_envs=4096, steps=1000, seed=0):
+    """Measure env-steps per second with a simple hover-below-the-gap policy"""
+    env = FlappyVecEnv(num_envs, seed=seed)
+    obs = env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        obs, _, _ = env.step(obs[:, 0] > obs[:, 3] + PIPE_GAP / 2)
+    elapsed = time.perf_counter() - start
+    return num_envs * steps / elapsed
+
+
+if __name__ == "__main__":
+    for n in (256, 4096, 65536):
+        print(f"{n:6d} envs: {benchmark(n) / 1e6:.1f}M env-steps/s")
@@ -0,0 +1,137 @@
+"""Run the games' simulation without a window and without a frame cap.
+
+Usage:
+    python headless.py flappy --steps 100000 --jump-every 20
+    python headless.py eco --steps 50000 --jump-prob 0.05 --seed 1 --render-every 60
+    python headless.py flappy --steps 100000 --autopilot
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GAMES = {
+    "flappy": "flappy bird.py",
+    "eco": "mygame.py",
+    "mirror": "ai game.py",
+}
+
+
+def use_dummy_drivers():
+    """Run SDL without a display or audio device; call before loading a game"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+def load_game_module(name):
+    """Import a game script by its short name (the file names contain spaces)"""
+    if name in sys.modules:
+        return sys.modules[name]
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, GAMES[name]))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def is_over(game):
+    return getattr(game, "game_over", False) or getattr(game, "game_state", None) == "game_over"
+
+
+def restart(game):
+    if hasattr(game, "restart"):
+        game.restart()
+    else:
+        game.reset_game()
+        game.game_state = "playing"
+
+
+def jump_every(frames):
+    """Scripted input: press jump on every n-th frame"""
+    return lambda game, frame: frame % frames == 0
+
+
+def random_jumps(probability, seed=None):
+    """Scripted input: press jump with a fixed probability each frame"""
+    rng = random.Random(seed)
+    return lambda game, frame: rng.random() < probability
+
+
+def autopilot():
+    """Flappy Bird reference agent backed by the precomputed reachability table"""
+    from flappy_autopilot import Autopilot
+    pilot = Autopilot()
+    return lambda game, frame: pilot.decide_game(game)
+
+
+def run(game, steps, policy, render_every=0):
+    """Step the game as fast as possible and return run statistics.
+
+    policy(game, frame) returns whether to jump this frame. The game restarts
+    automatically on game over. With render_every > 0, draw() is called on
+    every n-th step into the game's offscreen surface.
+    """
+    episodes = 0
+    scores = []
+    start = time.perf_counter()
+    for frame in range(steps):
+        game.step(policy(game, frame))
+        if render_every and frame % render_every == 0:
+            game.draw()
+        if is_over(game):
+            scores.append(game.score)
+            episodes += 1
+            restart(game)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "steps": steps,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed else float("inf"),
+        # Every game is tuned for 60 ticks per simulated second
+        "simulated_seconds_per_second": steps / 60 / elapsed if elapsed else float("inf"),
+        "episodes": episodes,
+        "best_score": max(scores, default=game.score),
+        "mean_score": sum(scores) / len(scores) if scores else float(game.score),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless, uncapped game simulation")
+    parser.add_argument("game", choices=sorted(GAMES))
+    parser.add_argument("--steps", type=int, default=60000)
+    parser.add_argument("--render-every", type=int, default=0, help="draw every N steps (0 = never)")
+    parser.add_argument("--jump-every", type=int, default=0, help="jump on every N-th frame")
+    parser.add_argument("--jump-prob", type=float, default=0.05, help="per-frame jump probability")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--autopilot", action="store_true", help="flappy only: use the reachability autopilot")
+    args = parser.parse_args()
+    if args.autopilot and args.game != "flappy":
+        parser.error("--autopilot only drives flappy")
+
+    use_dummy_drivers()
+    module = load_game_module(args.game)
+    game = module.Game(headless=True, seed=args.seed)
+    if args.autopilot:
+        policy = autopilot()
+    elif args.jump_every:
+        policy = jump_every(args.jump_every)
+    else:
+        policy = random_jumps(args.jump_prob, args.seed)
+
+    stats = run(game, args.steps, policy, args.render_every)
+    for key, value in stats.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
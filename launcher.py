@@ -0,0 +1,79 @@
+"""Single entry point for all the games, with a startup time breakdown.
+
+Only the display and font subsystems are started, and only the chosen game's
+module is imported. With --startup-report, the time spent importing pygame,
+starting subsystems, importing the game, building it and presenting the first
+frame is printed (and the game exits right after that first frame with
+--startup-only).
+
+Usage:
+    python launcher.py eco
+    python launcher.py mirror --startup-report
+    python launcher.py flappy --startup-only
+"""
+import argparse
+import sys
+import time
+
+START = time.perf_counter()
+
+GAMES = {
+    "flappy": "Flappy Bird",
+    "eco": "Eco Runner",
+    "mirror": "AI Mirror Game",
+}
+
+
+class StartupTimer:
+    def __init__(self):
+        self.last = START
+        self.steps = []
+
+    def lap(self, label):
+        now = time.perf_counter()
+        self.steps.append((label, now - self.last))
+        self.last = now
+
+    def report(self):
+        print("Startup breakdown:")
+        for label, seconds in self.steps:
+            print(f"  {label:<22} {seconds * 1000:8.1f} ms")
+        print(f"  {'time to first frame':<22} {(self.last - START) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Launch one of the games")
+    parser.add_argument("game", choices=sorted(GAMES), help=", ".join(f"{k}: {v}" for k, v in GAMES.items()))
+    parser.add_argument("--startup-report", action="store_true", help="print import/startup timings")
+    parser.add_argument("--startup-only", action="store_true", help="exit after the first frame")
+    args = parser.parse_args()
+    report = args.startup_report or args.startup_only
+
+    timer = StartupTimer()
+    import pygame
+    from rendering import init_subsystems
+    timer.lap("import pygame")
+    init_subsystems()
+    timer.lap("init display + font")
+
+    from headless import load_game_module
+    module = load_game_module(args.game)
+    timer.lap(f"import {args.game}")
+    game = module.Game()
+    timer.lap("create game")
+
+    def first_frame():
+        game.dirty.on_present = None
+        timer.lap("first frame")
+        if report:
+            timer.report()
+        if args.startup_only:
+            pygame.quit()
+            sys.exit()
+
+    game.dirty.on_present = first_frame
+    game.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Counters, gauges and fixed-bucket histograms for the live pipelines.
+
+Updating a metric is one attribute add (plus a bisect for histograms), so
+it is cheap enough for every frame of a hot loop. A registry can be read in
+two ways:
+
+    registry.serve(9100)                    # text exposition at http://127.0.0.1:9100/metrics
+    registry.dump_every("metrics.json", 10) # JSON snapshot rewritten every 10 s
+
+start_from_env() does both from METRICS_PORT / METRICS_JSON /
+METRICS_INTERVAL, the same way the profiler reads PROFILE_CSV.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers a fast ONNX pass up to a slow DeepFace analysis
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Counter:
+    __slots__ = ("name", "description", "value")
+    kind = "counter"
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        return [(self.name, self.value)]
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge(Counter):
+    __slots__ = ()
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ("name", "description", "buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name, description="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}', cumulative))
+        samples.append((f"{self.name}_sum", self.sum))
+        samples.append((f"{self.name}_count", self.count))
+        return samples
+
+    def snapshot(self):
+        return {"buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)),
+                "sum": self.sum, "count": self.count}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.server = None
+
+    def get(self, kind, name, description, *args):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = kind(name, description, *args)
+        return metric
+
+    def counter(self, name, description=""):
+        return self.get(Counter, name, description)
+
+    def gauge(self, name, description=""):
+        return self.get(Gauge, name, description)
+
+    def histogram(self, name, description="", buckets=LATENCY_BUCKETS):
+        return self.get(Histogram, name, description, buckets)
+
+    def exposition(self):
+        """Prometheus-style text format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            if metric.description:
+                lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {"time": time.time(), "metrics": {name: metric.snapshot() for name, metric in list(self.metrics.items())}}
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve exposition() on a daemon thread; localhost only by default"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would flood the console
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics at http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def dump(self, path):
+        # Write then rename so readers never see a half-written file
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(temporary, path)
+
+    def dump_every(self, path, interval=10.0):
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.dump(path)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server = None
+
+
+REGISTRY = Registry()
+
+
+def start_from_env(registry=REGISTRY):
+    port = os.environ.get("METRICS_PORT")
+    path = os.environ.get("METRICS_JSON")
+    if port:
+        registry.serve(int(port))
+    if path:
+        registry.dump_every(path, float(os.environ.get("METRICS_INTERVAL", "10")))
@@ -3,9 +3,13 @@ import pygame
 import random
 import sys
 import os
-
-# Initialize Pygame
-pygame.init()
+import json
+import struct
+from array import array
+from collision import hits, sprite_mask
+from profiler import FrameProfiler
+from rendering import DirtyScreen, get_events, init_subsystems, load_font, needs_repaint
+from snapshot import STATES, pack_rng, pack_values, unpack_rng, unpack_values
 
 # Game constants
 SCREEN_WIDTH = 600
@@ -15,6 +19,19 @@ GRAVITY = 0.8
 JUMP_STRENGTH = -15
 GROUND_HEIGHT = 50
 SCROLL_SPEED = 7
+DIRTY_RECTS = True  # Only push changed regions to the display
+
+# Level data
+SPAWN_KINDS = ["trash", "pollution", "recycle", "tree", "water"]
+OBSTACLE_KINDS = ("trash", "pollution")
+CHUNK_LENGTH = 2400  # Scroll distance covered by one generated chunk
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+LEVEL_FILES = ["intro.json"]  # Authored chunks played before the generated ones
+
+# frame, score, distance, state, player y, player velocity, jumping, animation frame,
+# animation timer, obstacle count, item count, spawn cursor, loaded until,
+# queued spawns, level file index, next generated position, layer offsets
+SNAPSHOT_HEADER = struct.Struct("<IiqBddBBBHHIqIHqdd")
 
 # Colors
 WHITE = (255, 255, 255)
@@ -29,6 +46,9 @@ GRAY = (128, 128, 128)
 DARK_GREEN = (0, 100, 0)
 
 class Player:
+    __slots__ = ("width", "height", "x", "y", "ground_y", "velocity_y", "is_jumping",
+                 "animation_frame", "animation_timer")
+    
     def __init__(self):
         self.width = 40
         self.height = 60
@@ -84,11 +104,18 @@ class Player:
             # Jumping pose
             pygame.draw.rect(screen, DARK_GREEN, (self.x + 10, self.y + self.height - 15, 8, 15))
             pygame.draw.rect(screen, DARK_GREEN, (self.x + 22, self.y + self.height - 15, 8, 15))
+        return self.get_rect()
     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def get_mask(self):
+        # The legs stay inside the body in every pose, so one mask fits all frames
+        return sprite_mask("eco player", (self.width, self.height), Player)
 
 class Obstacle:
+    __slots__ = ("x", "type", "width", "height", "y", "color")
+    
     def __init__(self, x, obstacle_type):
         self.x = x
         self.type = obstacle_type
@@ -118,11 +145,19 @@ class Obstacle:
             pygame.draw.circle(screen, self.color, (self.x + 15, self.y + 15), 15)
             pygame.draw.circle(screen, self.color, (self.x + 35, self.y + 15), 12)
             pygame.draw.circle(screen, self.color, (self.x + 25, self.y + 5), 10)
+        # Lid and cloud puffs stick out of the hitbox by a few pixels
+        return self.get_rect().inflate(4, 10)
     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def get_mask(self):
+        return sprite_mask(("eco obstacle", self.type), (self.width, self.height),
+                           lambda: Obstacle(0, self.type))
 
 class EcoItem:
+    __slots__ = ("x", "type", "width", "height", "y", "color")
+    
     def __init__(self, x, item_type):
         self.x = x
         self.type = item_type
@@ -156,113 +191,281 @@ class EcoItem:
             # Draw water drop
             pygame.draw.circle(screen, self.color, (self.x + 12, self.y + 15), 8)
             pygame.draw.polygon(screen, self.color, [(self.x + 12, self.y + 5), (self.x + 8, self.y + 12), (self.x + 16, self.y + 12)])
+        return self.get_rect()
     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def get_mask(self):
+        return sprite_mask(("eco item", self.type), (self.width, self.height),
+                           lambda: EcoItem(0, self.type))
+
+def load_chunk(path):
+    """Read an authored chunk: {"length": px, "spawns": [[offset_px, kind], ...]}"""
+    with open(path) as f:
+        data = json.load(f)
+    return data["length"], [(offset, kind) for offset, kind in data["spawns"]]
+
+class LevelChunks:
+    """The authored chunk files in order, then endless seeded chunks.
+
+    Generated chunks place a spawn every 60-120 frames of scrolling, 30% of
+    them obstacles. The iterator's state is two integers, so it can be
+    snapshotted along with the game.
+    """
+    def __init__(self, rng, files=LEVEL_FILES):
+        self.rng = rng
+        self.files = files
+        self.file_index = 0
+        self.position = None  # Next generated spawn, relative to the next chunk
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        if self.file_index < len(self.files):
+            self.file_index += 1
+            return load_chunk(os.path.join(LEVEL_DIR, self.files[self.file_index - 1]))
+        
+        rng = self.rng
+        if self.position is None:
+            self.position = rng.randint(60, 120) * SCROLL_SPEED
+        spawns = []
+        while self.position < CHUNK_LENGTH:
+            if rng.random() < 0.3:
+                kind = rng.choice(["trash", "pollution"])
+            else:
+                kind = rng.choice(["recycle", "tree", "water"])
+            spawns.append((self.position, kind))
+            self.position += rng.randint(60, 120) * SCROLL_SPEED
+        self.position -= CHUNK_LENGTH  # Carry the pacing over into the next chunk
+        return CHUNK_LENGTH, spawns
+
+class SpawnTimeline:
+    """Spawn positions of a level, streamed one chunk at a time.
+
+    Chunks are compiled into flat arrays of absolute positions and kind codes
+    just before the scroll position reaches them, and spawned entries are
+    dropped, so memory stays constant however long the run.
+    """
+    def __init__(self, chunks, lookahead=SCREEN_WIDTH):
+        self.chunks = chunks
+        self.lookahead = lookahead
+        self.positions = array('q')
+        self.kinds = array('B')
+        self.cursor = 0
+        self.loaded_until = 0
+    
+    def load_next_chunk(self):
+        length, spawns = next(self.chunks)
+        del self.positions[:self.cursor]
+        del self.kinds[:self.cursor]
+        self.cursor = 0
+        for offset, kind in sorted(spawns):
+            self.positions.append(self.loaded_until + offset)
+            self.kinds.append(SPAWN_KINDS.index(kind))
+        self.loaded_until += length
+    
+    def advance(self, distance):
+        """Return (position, kind) for every spawn the scroll distance has reached"""
+        while self.loaded_until <= distance + self.lookahead:
+            self.load_next_chunk()
+        due = []
+        while self.cursor < len(self.positions) and self.positions[self.cursor] <= distance:
+            due.append((self.positions[self.cursor], SPAWN_KINDS[self.kinds[self.cursor]]))
+            self.cursor += 1
+        return due
+
+class ParallaxLayer:
+    """Pre-rendered, horizontally tileable strip of scenery scrolled by offset"""
+    def __init__(self, surface, y, speed):
+        self.surface = surface
+        self.y = y
+        self.speed = speed
+        self.offset = 0.0
+        self.rect = pygame.Rect(0, y, SCREEN_WIDTH, surface.get_height())
+    
+    def update(self):
+        self.offset = (self.offset + self.speed) % self.surface.get_width()
+    
+    def draw(self, screen):
+        # One blit for the visible part of the strip, plus one for the wrap-around
+        x = int(self.offset)
+        visible = min(SCREEN_WIDTH, self.surface.get_width() - x)
+        screen.blit(self.surface, (0, self.y), (x, 0, visible, self.rect.height))
+        if visible < SCREEN_WIDTH:
+            screen.blit(self.surface, (visible, self.y), (0, 0, SCREEN_WIDTH - visible, self.rect.height))
+        return self.rect
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Eco Runner")
+    # Game.observe() values
+    STATE_FIELDS = ("player_y", "velocity_y", "obstacle_dx", "obstacle_y", "item_dx", "item_y")
+    
+    def __init__(self, headless=False, seed=None):
+        self.headless = headless
+        init_subsystems()
+        # All gameplay randomness comes from one seeded generator so sessions can be replayed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.recorder = None
+        self.dataset = None  # dataset_recorder.DatasetRecorder while recording training data
+        self.frame = 0
+        if headless:
+            # Offscreen target: no window is opened and draw() only runs when asked
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Eco Runner")
         self.clock = pygame.time.Clock()
+        self.profiler = FrameProfiler("eco", ["events", "spawn", "update", "draw", "present", "tick"])
+        self.dirty = DirtyScreen(self.screen, self.create_static_background(), DIRTY_RECTS, display=not headless)
         
         # Sound removed
         
-        self.font_large = pygame.font.Font(None, 48)
-        self.font_medium = pygame.font.Font(None, 36)
-        self.font_small = pygame.font.Font(None, 24)
+        self.font_large = load_font(48)
+        self.font_medium = load_font(36)
+        self.font_small = load_font(24)
         
         self.reset_game()
-        self.game_state = "menu"  # "menu", "playing", "game_over"
+        self.game_state = "playing" if headless else "menu"  # "menu", "playing", "game_over"
         
         # Background elements
-        self.clouds = []
-        self.trees = []
+        self.layers = []
         self.init_background()
     
     
     
     def init_background(self):
-        # Initialize clouds
-        for i in range(3):
-            self.clouds.append({
-                'x': i * 200 + random.randint(0, 100),
-                'y': random.randint(50, 150),
-                'speed': random.uniform(0.5, 1.5)
-            })
-        
-        # Initialize background trees
-        for i in range(5):
-            self.trees.append({
-                'x': i * 120 + random.randint(0, 50),
-                'y': SCREEN_HEIGHT - GROUND_HEIGHT - 60,
-                'height': random.randint(40, 70)
-            })
+        # Scenery is drawn once into wide strips; the sky and ground are part of
+        # the static background, so each strip is opaque over the sky colour
+        # Scenery has its own generator so it never shifts the gameplay sequence
+        rng = random.Random(self.seed)
+        cloud_layer = pygame.Surface((SCREEN_WIDTH * 3, 150)).convert(self.screen)
+        cloud_layer.fill(BLUE)
+        for i in range(9):
+            x = i * 200 + rng.randint(0, 100)
+            y = rng.randint(50, 150) - 25
+            self.draw_tiled(cloud_layer, self.draw_cloud, x, y)
+        
+        tree_top = SCREEN_HEIGHT - GROUND_HEIGHT - 75
+        tree_layer = pygame.Surface((SCREEN_WIDTH * 2, 75)).convert(self.screen)
+        tree_layer.fill(BLUE)
+        for i in range(10):
+            x = i * 120 + rng.randint(0, 50)
+            y = SCREEN_HEIGHT - GROUND_HEIGHT - 60 - tree_top
+            self.draw_tiled(tree_layer, self.draw_tree, x, y, rng.randint(40, 70))
+        
+        self.layers = [
+            ParallaxLayer(cloud_layer, 25, 1.0),
+            ParallaxLayer(tree_layer, tree_top, SCROLL_SPEED * 0.3),  # Slower parallax effect
+        ]
+    
+    def draw_tiled(self, surface, draw, x, *args):
+        # Repeat a strip-width to either side: shapes crossing one edge of the
+        # strip continue from the other, so the strip wraps seamlessly
+        width = surface.get_width()
+        for offset in (-width, 0, width):
+            draw(surface, x + offset, *args)
+    
+    def draw_cloud(self, surface, x, y):
+        pygame.draw.circle(surface, WHITE, (x, y), 20)
+        pygame.draw.circle(surface, WHITE, (x + 25, y), 15)
+        pygame.draw.circle(surface, WHITE, (x - 20, y + 5), 18)
+    
+    def draw_tree(self, surface, x, y, height):
+        pygame.draw.rect(surface, BROWN, (x + 15, y + height - 20, 8, 20))
+        pygame.draw.circle(surface, DARK_GREEN, (x + 19, y + height - 30), 25)
     
     def reset_game(self):
         self.player = Player()
         self.obstacles = []
         self.eco_items = []
         self.score = 0
-        self.spawn_timer = 0
         self.distance = 0
+        self.spawns = SpawnTimeline(LevelChunks(self.rng))
+    
+    def snapshot(self):
+        """Pack the whole simulation state, RNG included, into bytes"""
+        player = self.player
+        spawns = self.spawns
+        level = spawns.chunks
+        entities = []
+        for entity in self.obstacles + self.eco_items:
+            entities += (entity.x, SPAWN_KINDS.index(entity.type))
+        header = SNAPSHOT_HEADER.pack(
+            self.frame, self.score, self.distance, STATES.index(self.game_state),
+            player.y, player.velocity_y, player.is_jumping, player.animation_frame, player.animation_timer,
+            len(self.obstacles), len(self.eco_items),
+            spawns.cursor, spawns.loaded_until, len(spawns.positions),
+            level.file_index, -1 if level.position is None else level.position,
+            self.layers[0].offset, self.layers[1].offset)
+        return (header + pack_values(entities) + spawns.positions.tobytes() + spawns.kinds.tobytes()
+                + pack_rng(self.rng))
+    
+    def restore(self, data):
+        """Return to a state produced by snapshot()"""
+        (self.frame, self.score, self.distance, state,
+         y, velocity_y, is_jumping, animation_frame, animation_timer,
+         obstacle_count, item_count, cursor, loaded_until, queued,
+         file_index, position, cloud_offset, tree_offset) = SNAPSHOT_HEADER.unpack_from(data)
+        self.game_state = STATES[state]
+        
+        player = self.player
+        player.y, player.velocity_y, player.is_jumping = y, velocity_y, bool(is_jumping)
+        player.animation_frame, player.animation_timer = animation_frame, animation_timer
+        
+        values, offset = unpack_values(data, SNAPSHOT_HEADER.size, 2 * (obstacle_count + item_count))
+        self.obstacles = [Obstacle(int(values[i]), SPAWN_KINDS[int(values[i + 1])])
+                          for i in range(0, 2 * obstacle_count, 2)]
+        self.eco_items = [EcoItem(int(values[i]), SPAWN_KINDS[int(values[i + 1])])
+                          for i in range(2 * obstacle_count, len(values), 2)]
+        
+        spawns = self.spawns
+        spawns.positions, offset = unpack_values(data, offset, queued, 'q')
+        spawns.kinds, offset = unpack_values(data, offset, queued, 'B')
+        spawns.cursor, spawns.loaded_until = cursor, loaded_until
+        spawns.chunks.file_index = file_index
+        spawns.chunks.position = None if position < 0 else position
+        self.layers[0].offset, self.layers[1].offset = cloud_offset, tree_offset
+        unpack_rng(self.rng, data, offset)
     
     def spawn_objects(self):
-        self.spawn_timer += 1
-        
-        # Spawn obstacles and items
-        if self.spawn_timer >= random.randint(60, 120):  # 1-2 seconds at 60 FPS
-            spawn_x = SCREEN_WIDTH + 50
-            
-            # Decide what to spawn (30% obstacle, 70% eco item)
-            if random.random() < 0.3:
-                obstacle_type = random.choice(["trash", "pollution"])
-                self.obstacles.append(Obstacle(spawn_x, obstacle_type))
+        self.distance += SCROLL_SPEED
+        
+        # Spawn whatever the level places at the distance scrolled so far
+        for position, kind in self.spawns.advance(self.distance):
+            # Keep exact spacing when a position falls between two frames
+            spawn_x = SCREEN_WIDTH + 50 - (self.distance - position)
+            if kind in OBSTACLE_KINDS:
+                self.obstacles.append(Obstacle(spawn_x, kind))
             else:
-                item_type = random.choice(["recycle", "tree", "water"])
-                self.eco_items.append(EcoItem(spawn_x, item_type))
-            
-            self.spawn_timer = 0
+                self.eco_items.append(EcoItem(spawn_x, kind))
     
     def update_background(self):
-        # Update clouds
-        for cloud in self.clouds:
-            cloud['x'] -= cloud['speed']
-            if cloud['x'] < -100:
-                cloud['x'] = SCREEN_WIDTH + random.randint(0, 100)
-                cloud['y'] = random.randint(50, 150)
-        
-        # Update trees
-        for tree in self.trees:
-            tree['x'] -= SCROLL_SPEED * 0.3  # Slower parallax effect
-            if tree['x'] < -50:
-                tree['x'] = SCREEN_WIDTH + random.randint(0, 50)
-                tree['height'] = random.randint(40, 70)
+        for layer in self.layers:
+            layer.update()
+    
+    def create_static_background(self):
+        # Sky and ground never change, so they are drawn once and reused
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert(self.screen)
+        background.fill(BLUE)
+        pygame.draw.rect(background, GREEN, (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
+        pygame.draw.rect(background, BROWN, (0, SCREEN_HEIGHT - 10, SCREEN_WIDTH, 10))
+        return background
     
     def draw_background(self):
-        # Sky
-        self.screen.fill(BLUE)
-        
-        # Clouds
-        for cloud in self.clouds:
-            pygame.draw.circle(self.screen, WHITE, (int(cloud['x']), int(cloud['y'])), 20)
-            pygame.draw.circle(self.screen, WHITE, (int(cloud['x'] + 25), int(cloud['y'])), 15)
-            pygame.draw.circle(self.screen, WHITE, (int(cloud['x'] - 20), int(cloud['y'] + 5)), 18)
-        
-        # Background trees
-        for tree in self.trees:
-            pygame.draw.rect(self.screen, BROWN, (tree['x'] + 15, tree['y'] + tree['height'] - 20, 8, 20))
-            pygame.draw.circle(self.screen, DARK_GREEN, (tree['x'] + 19, tree['y'] + tree['height'] - 30), 25)
+        # Sky and ground
+        self.dirty.clear()
         
-        # Ground
-        pygame.draw.rect(self.screen, GREEN, (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
-        pygame.draw.rect(self.screen, BROWN, (0, SCREEN_HEIGHT - 10, SCREEN_WIDTH, 10))
+        # Clouds and background trees
+        for layer in self.layers:
+            self.dirty.mark(layer.draw(self.screen))
     
     def draw_score(self):
         score_text = self.font_medium.render(f"Score: {self.score}", True, WHITE)
         score_shadow = self.font_medium.render(f"Score: {self.score}", True, BLACK)
-        self.screen.blit(score_shadow, (11, 11))
-        self.screen.blit(score_text, (10, 10))
+        self.dirty.mark(self.screen.blit(score_shadow, (11, 11)))
+        self.dirty.mark(self.screen.blit(score_text, (10, 10)))
     
     def main_menu(self):
         self.draw_background()
@@ -313,19 +516,33 @@ class Game:
         self.screen.blit(restart_shadow, (restart_rect.x + 2, restart_rect.y + 2))
         self.screen.blit(restart_text, restart_rect)
     
-    def game_loop(self):
+    def step(self, jump=False):
+        """Advance the simulation by one tick, jumping first if asked (headless input)"""
+        if jump and self.game_state == "playing":
+            self.player.jump()
+        self.update()
+    
+    def update(self):
+        self.frame += 1
+        
         # Spawn objects
         self.spawn_objects()
+        self.profiler.mark("spawn")
         
         # Update player
-        self.player.update()
+        player = self.player
+        player.update()
+        player_mask = player.get_mask()
+        # Broadphase: only entities level with the player along x get a mask test
+        left, right = player.x, player.x + player.width
         
         # Update and check obstacles
         for obstacle in self.obstacles[:]:
             obstacle.update()
             if obstacle.x < -obstacle.width:
                 self.obstacles.remove(obstacle)
-            elif self.player.get_rect().colliderect(obstacle.get_rect()):
+            elif (obstacle.x < right and obstacle.x + obstacle.width > left
+                  and hits(player.x, player.y, player_mask, obstacle.x, obstacle.y, obstacle.get_mask())):
                 self.game_state = "game_over"
         
         # Update and check eco items
@@ -333,61 +550,111 @@ class Game:
             item.update()
             if item.x < -item.width:
                 self.eco_items.remove(item)
-            elif self.player.get_rect().colliderect(item.get_rect()):
+            elif (item.x < right and item.x + item.width > left
+                  and hits(player.x, player.y, player_mask, item.x, item.y, item.get_mask())):
                 self.eco_items.remove(item)
                 self.score += 10
         
         # Update background
         self.update_background()
-        
+    
+    def observe(self):
+        """Player y and velocity, then distance and y of the next obstacle and the next item"""
+        player = self.player
+        state = [player.y, player.velocity_y]
+        for entities in (self.obstacles, self.eco_items):
+            ahead = [entity for entity in entities if entity.x + entity.width >= player.x]
+            if ahead:
+                entity = min(ahead, key=lambda entity: entity.x)
+                state += (entity.x - player.x, entity.y)
+            else:
+                state += (SCREEN_WIDTH - player.x, 0)
+        return state
+    
+    def draw(self):
         # Draw everything
         self.draw_background()
         
         # Draw obstacles and items
         for obstacle in self.obstacles:
-            obstacle.draw(self.screen)
+            self.dirty.mark(obstacle.draw(self.screen))
         
         for item in self.eco_items:
-            item.draw(self.screen)
+            self.dirty.mark(item.draw(self.screen))
         
         # Draw player
-        self.player.draw(self.screen)
+        self.dirty.mark(self.player.draw(self.screen))
         
         # Draw UI
         self.draw_score()
     
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+    def game_loop(self):
+        self.update()
+        self.profiler.mark("update")
+        self.draw()
+        if self.dataset:
+            self.dataset.record(self.screen, self.frame, self.score, self.game_state == "game_over", self.observe())
+        self.dirty.mark(self.profiler.draw(self.screen))
+        self.profiler.mark("draw")
+    
+    def press_space(self):
+        if self.recorder:
+            self.recorder.space(self.frame)
+        if self.dataset:
+            self.dataset.press()
+        if self.game_state == "menu":
+            self.game_state = "playing"
+        elif self.game_state == "playing":
+            self.player.jump()
+        elif self.game_state == "game_over":
+            self.reset_game()
+            self.game_state = "playing"
+    
+    def handle_events(self, block=False):
+        for event in get_events(block):
+            if needs_repaint(event):
+                self.dirty.invalidate()
+            elif event.type == pygame.QUIT:
                 return False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    if self.game_state == "menu":
-                        self.game_state = "playing"
-                    elif self.game_state == "playing":
-                        self.player.jump()
-                    elif self.game_state == "game_over":
-                        self.reset_game()
-                        self.game_state = "playing"
+                    self.press_space()
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle()
                 elif event.key == pygame.K_ESCAPE:
                     return False
         return True
     
     def run(self):
         running = True
+        shown_state = None
         while running:
-            running = self.handle_events()
+            self.profiler.begin_frame()
+            # Menu and game over screens are static: draw them once, then sleep until input
+            idle = self.game_state != "playing" and self.game_state == shown_state and not self.dirty.full_redraw
+            running = self.handle_events(block=idle)
+            self.profiler.mark("events")
+            
+            if self.game_state != shown_state:
+                self.dirty.invalidate()
+                shown_state = self.game_state
             
-            if self.game_state == "menu":
-                self.main_menu()
-            elif self.game_state == "playing":
+            if self.game_state == "playing":
                 self.game_loop()
-            elif self.game_state == "game_over":
-                self.game_over_screen()
+            elif self.dirty.full_redraw:
+                if self.game_state == "menu":
+                    self.main_menu()
+                elif self.game_state == "game_over":
+                    self.game_over_screen()
+                self.profiler.mark("draw")
+            self.dirty.present()
+            self.profiler.mark("present")
             
-            pygame.display.flip()
             self.clock.tick(FPS)
+            self.profiler.mark("tick")
+            self.profiler.end_frame()
         
+        self.profiler.dump_csv()
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,126 @@
+import csv
+import os
+import time
+from array import array
+
+import pygame
+
+OVERLAY_WIDTH = 220
+GRAPH_HEIGHT = 50
+REFRESH_FRAMES = 15  # Rebuild the overlay text this often
+
+
+class FrameProfiler:
+    """Per-phase frame timings kept in a fixed-size ring buffer.
+
+    The game loop calls begin_frame(), then mark(phase) at the end of each
+    phase, then end_frame(). Time since the previous mark is added to the
+    named phase. Recording costs one perf_counter() call per mark; the
+    overlay (toggled with F3) is only built while it is visible.
+    """
+
+    def __init__(self, name, phases, size=600):
+        self.name = name
+        self.phases = list(phases)
+        self.size = size
+        self.index = 0
+        self.count = 0
+        self.frames = 0  # Frames ever recorded; count stops at size once the buffer is full
+        self.samples = {phase: array("d", bytes(8 * size)) for phase in self.phases}
+        self.totals = array("d", bytes(8 * size))
+        self.last_mark = time.perf_counter()
+        self.frame_start = self.last_mark
+        self.visible = False
+        self.csv_path = os.environ.get("PROFILE_CSV")
+        self.overlay = None
+        self.font = None
+
+    def begin_frame(self):
+        i = self.index
+        for phase in self.phases:
+            self.samples[phase][i] = 0.0
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.samples[phase][self.index] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        self.totals[self.index] = time.perf_counter() - self.frame_start
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.frames += 1
+        if self.visible and self.frames % REFRESH_FRAMES == 0:
+            self.overlay = None
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.overlay = None
+        if self.visible and self.csv_path is None:
+            self.csv_path = f"{self.name}_profile.csv"
+
+    def ordered(self, values):
+        """Ring buffer contents, oldest first"""
+        if self.count < self.size:
+            return values[:self.count]
+        return values[self.index:] + values[:self.index]
+
+    def stats(self):
+        """Average and maximum milliseconds per phase over the buffered frames"""
+        n = max(self.count, 1)
+        result = {}
+        for phase in self.phases + ["frame"]:
+            values = self.ordered(self.totals if phase == "frame" else self.samples[phase])
+            result[phase] = (sum(values) * 1000 / n, max(values, default=0.0) * 1000)
+        return result
+
+    def build_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.SysFont("monospace", 12)
+        rows = self.stats()
+        height = GRAPH_HEIGHT + 16 * (len(rows) + 1) + 10
+        overlay = pygame.Surface((OVERLAY_WIDTH, height))
+        overlay.set_alpha(200)
+        overlay.fill((0, 0, 0))
+
+        # Frame-time graph; the line marks the 60 FPS budget
+        totals = self.ordered(self.totals)
+        scale = GRAPH_HEIGHT / max(max(totals, default=0.0), 1 / 30)
+        budget_y = GRAPH_HEIGHT - int(scale / 60)
+        pygame.draw.line(overlay, (255, 80, 80), (0, budget_y), (OVERLAY_WIDTH, budget_y))
+        step = max(len(totals) // OVERLAY_WIDTH, 1)
+        points = [(x, GRAPH_HEIGHT - int(totals[i] * scale))
+                  for x, i in enumerate(range(max(len(totals) - OVERLAY_WIDTH * step, 0), len(totals), step))]
+        if len(points) > 1:
+            pygame.draw.lines(overlay, (80, 255, 80), False, points)
+
+        y = GRAPH_HEIGHT + 5
+        overlay.blit(self.font.render("phase       avg ms   max ms", True, (200, 200, 200)), (5, y))
+        for phase, (avg, peak) in rows.items():
+            y += 16
+            text = f"{phase:<10} {avg:7.2f} {peak:8.2f}"
+            overlay.blit(self.font.render(text, True, (255, 255, 255)), (5, y))
+        self.overlay = overlay
+
+    def draw(self, screen):
+        """Blit the overlay in the top-right corner; returns its rect or None"""
+        if not self.visible:
+            return None
+        if self.overlay is None:
+            self.build_overlay()
+        return screen.blit(self.overlay, (screen.get_width() - OVERLAY_WIDTH - 5, 5))
+
+    def dump_csv(self, path=None):
+        """Write the buffered frames as one CSV row each, in milliseconds"""
+        path = path or self.csv_path
+        if not path or not self.count:
+            return
+        columns = [self.ordered(self.samples[phase]) for phase in self.phases]
+        totals = self.ordered(self.totals)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + [f"{phase}_ms" for phase in self.phases] + ["total_ms"])
+            for row in range(len(totals)):
+                writer.writerow([row] + [f"{column[row] * 1000:.4f}" for column in columns]
+                                + [f"{totals[row] * 1000:.4f}"])
@@ -0,0 +1,85 @@
+import pygame
+
+_fonts = {}
+
+
+def init_subsystems():
+    """Start only the pygame subsystems the games use: no audio, joystick, etc.
+
+    The display subsystem opens no window by itself; headless games need it
+    for surface format conversion.
+    """
+    pygame.display.init()
+    pygame.font.init()
+
+
+def load_font(size):
+    """Default font at the given size, loaded once per process"""
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+
+class DirtyScreen:
+    """Redraws and presents only the parts of the window that changed.
+
+    The background is cached once; each frame the areas drawn last frame are
+    restored from it, the new sprites are marked, and only the union of the old
+    and new rects is pushed with pygame.display.update().
+    """
+
+    def __init__(self, screen, background, enabled=True, display=True):
+        self.screen = screen
+        self.background = background
+        self.enabled = enabled
+        self.display = display  # False for offscreen (headless) rendering
+        self.last_rects = []
+        self.rects = []
+        self.full_redraw = True
+        self.on_present = None  # Optional callback run after each present()
+
+    def set_background(self, background):
+        self.background = background
+        self.invalidate()
+
+    def invalidate(self):
+        """Force the next frame to repaint and present the whole window"""
+        self.full_redraw = True
+
+    def clear(self):
+        if self.full_redraw or not self.enabled:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.last_rects:
+                self.screen.blit(self.background, rect, rect)
+
+    def mark(self, rect):
+        if rect is not None:
+            self.rects.append(pygame.Rect(rect))
+        return rect
+
+    def present(self):
+        if not self.display:
+            pass
+        elif self.full_redraw or not self.enabled:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.last_rects + self.rects)
+        self.last_rects = self.rects
+        self.rects = []
+        self.full_redraw = False
+        if self.on_present:
+            self.on_present()
+
+
+def get_events(block=False):
+    """Return pending events; when block is set, sleep until at least one arrives"""
+    if block:
+        return [pygame.event.wait()] + pygame.event.get()
+    return pygame.event.get()
+
+
+def needs_repaint(event):
+    """True for window events after which a static screen must be drawn again"""
+    return event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
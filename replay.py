@@ -0,0 +1,164 @@
+"""Deterministic session recording and replay for the games.
+
+A recording is the game's RNG seed plus a compact binary log of inputs keyed
+by simulation frame (the number of update() ticks so far). Replaying feeds
+the same inputs on the same frames, so the session is reproduced exactly,
+either headlessly at maximum speed or rendered at normal speed.
+
+Usage:
+    python replay.py record flappy session.rec [--seed 42]
+    python replay.py play session.rec            # headless, prints a checksum
+    python replay.py play session.rec --render   # watch it at 60 FPS
+"""
+import argparse
+import struct
+import time
+import zlib
+
+from headless import GAMES, load_game_module, use_dummy_drivers
+
+MAGIC = b"GREC"
+VERSION = 1
+HEADER = struct.Struct("<4sB16sQ")  # magic, version, game name, seed
+RECORD = struct.Struct("<IB")  # frame, input code
+
+# Input codes
+END = 0  # Written on close; its frame is the session length
+SPACE = 1
+EMOTION_BASE = 16  # EMOTION_BASE + index into EMOTIONS
+EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+
+class InputRecorder:
+    """Appends frame-indexed inputs of a live session to a recording file"""
+
+    def __init__(self, path, game_name, seed):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, game_name.encode(), seed))
+        self.last_frame = 0
+
+    def record(self, frame, code):
+        self.file.write(RECORD.pack(frame, code))
+        self.last_frame = frame
+
+    def space(self, frame):
+        self.record(frame, SPACE)
+
+    def emotion(self, frame, emotion):
+        if emotion in EMOTIONS:
+            self.record(frame, EMOTION_BASE + EMOTIONS.index(emotion))
+
+    def close(self, frame=None):
+        if self.file.closed:
+            return
+        self.record(self.last_frame if frame is None else frame, END)
+        self.file.close()
+
+
+class InputLog:
+    """A recording loaded into memory"""
+
+    def __init__(self, game_name, seed, records):
+        self.game_name = game_name
+        self.seed = seed
+        self.records = records  # List of (frame, code), in recorded order
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, name, seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} recording")
+        records = list(RECORD.iter_unpack(data[HEADER.size:]))
+        return cls(name.rstrip(b"\0").decode(), seed, records)
+
+    @property
+    def frames(self):
+        for frame, code in reversed(self.records):
+            if code == END:
+                return frame
+        return self.records[-1][0] if self.records else 0
+
+
+def apply_input(game, code):
+    if code == SPACE:
+        game.press_space()
+    elif code >= EMOTION_BASE:
+        game.emotion_detector.current_emotion = EMOTIONS[code - EMOTION_BASE]
+
+
+def is_playing(game):
+    if hasattr(game, "game_state"):
+        return game.game_state == "playing"
+    return not game.game_over
+
+
+def state_checksum(game, checksum=0):
+    """Fold the gameplay-relevant state of one frame into a running CRC"""
+    player = getattr(game, "player", None) or game.bird
+    values = (game.frame, game.score, player.y, getattr(game, "lives", 0))
+    return zlib.crc32(repr(values).encode(), checksum)
+
+
+def replay(path, render=False):
+    """Re-run a recording; returns (game, checksum over every simulated frame)"""
+    log = InputLog.load(path)
+    if not render:
+        use_dummy_drivers()
+    module = load_game_module(log.game_name)
+    game = module.Game(headless=not render, seed=log.seed)
+    # Recordings start where a live session does, on the menu and without the camera
+    if hasattr(game, "game_state"):
+        game.game_state = "menu"
+    if hasattr(game, "use_camera"):
+        game.use_camera = False
+
+    checksum = 0
+    records = log.records
+    i = 0
+    while True:
+        while i < len(records) and records[i][0] == game.frame:
+            apply_input(game, records[i][1])
+            i += 1
+        # A menu or game over screen with no more input is where the session ended
+        if game.frame >= log.frames or not is_playing(game):
+            break
+        game.update()
+        checksum = state_checksum(game, checksum)
+        if render:
+            game.draw()
+            game.dirty.present()
+            game.clock.tick(60)
+    return game, checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay a game session")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="play normally while recording inputs")
+    rec.add_argument("game", choices=sorted(GAMES))
+    rec.add_argument("path")
+    rec.add_argument("--seed", type=int, default=None)
+    play = sub.add_parser("play", help="replay a recording")
+    play.add_argument("path")
+    play.add_argument("--render", action="store_true", help="show the replay at normal speed")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        module = load_game_module(args.game)
+        game = module.Game(seed=args.seed)
+        game.recorder = InputRecorder(args.path, args.game, game.seed)
+        try:
+            game.run()
+        finally:
+            game.recorder.close(game.frame)
+    else:
+        start = time.perf_counter()
+        game, checksum = replay(args.path, args.render)
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {game.frame} frames in {elapsed:.3f}s, score {game.score}, checksum {checksum:08x}")
+
+
+if __name__ == "__main__":
+    main()
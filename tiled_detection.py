@@ -0,0 +1,105 @@
+"""Tiled inference for frames much larger than the model input.
+
+A 1080p or 4K frame squeezed into a 640 px model input loses small objects.
+TiledDetector wraps any backend from detection_backends. It cuts the frame
+into overlapping tile_size tiles and adds the whole frame downscaled, so
+objects larger than a tile are still found. All of these run as one batch
+through detect_batch(), or across a thread pool for backends that are
+safe to call from several threads (ONNX Runtime sessions are, and release
+the GIL during inference; an ultralytics predictor keeps per-call state and
+is not). Latency is therefore bounded by one tile batch, not by the frame
+size.
+
+Per-tile boxes are shifted back to frame coordinates and merged with a
+vectorized, class-aware NMS on intersection over the smaller box. A box cut
+by a tile border is mostly contained in the whole-object box from the
+neighbouring tile, so it is recognised as a duplicate even though its IoU
+with that box is low.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from detection_backends import Detections, box_intersection
+
+MERGE_THRESHOLD = 0.6
+THREAD_SAFE_BACKENDS = {"onnx", "stub"}  # One instance may serve a thread pool
+
+
+def tile_origins(length, tile, overlap):
+    """Start offsets covering [0, length) with tiles overlapping by the given fraction"""
+    if length <= tile:
+        return [0]
+    stride = max(int(tile * (1 - overlap)), 1)
+    return list(range(0, length - tile, stride)) + [length - tile]
+
+
+def merge_nms(detections, threshold=MERGE_THRESHOLD):
+    """Fast NMS: drop every box overlapping a higher-scoring same-class box by more than threshold.
+
+    One pairwise matrix replaces the sequential greedy loop. It is slightly
+    more aggressive than greedy NMS, which suits duplicates from overlapping
+    tiles.
+    """
+    if len(detections) < 2:
+        return detections
+    order = np.argsort(-detections.scores, kind="stable")
+    boxes = detections.boxes[order]
+    class_ids = detections.class_ids[order]
+    areas = (boxes[:, 2:] - boxes[:, :2]).prod(axis=1)
+    smaller = np.minimum(areas[:, None], areas[None, :])
+    overlap = box_intersection(boxes, boxes) / np.maximum(smaller, 1e-9)
+    overlap[class_ids[:, None] != class_ids[None, :]] = 0
+    # Row i outscores column j only above the diagonal
+    keep = np.triu(overlap, k=1).max(axis=0) <= threshold
+    return detections.select(order[keep])
+
+
+class TiledDetector:
+    """A backend whose detect() splits large frames into overlapping tiles"""
+
+    def __init__(self, backend, tile_size=640, overlap=0.2, workers=0, full_frame=True,
+                 merge_threshold=MERGE_THRESHOLD):
+        self.backend = backend
+        self.name = f"tiled {backend.name}"
+        self.names = backend.names
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.merge_threshold = merge_threshold
+        if workers and backend.name not in THREAD_SAFE_BACKENDS:
+            raise ValueError(f"the {backend.name} backend is not thread-safe; use workers=0 to run tiles as one batch")
+        self.pool = ThreadPoolExecutor(workers) if workers else None
+
+    def tiles(self, frame):
+        """(x, y) origin and view of every tile, plus the whole frame when enabled"""
+        height, width = frame.shape[:2]
+        tile = self.tile_size
+        tiles = [((x, y), frame[y:y + tile, x:x + tile])
+                 for y in tile_origins(height, tile, self.overlap)
+                 for x in tile_origins(width, tile, self.overlap)]
+        if self.full_frame:
+            tiles.append(((0, 0), frame))
+        return tiles
+
+    def detect(self, frame, size=640, confidence=0.5):
+        height, width = frame.shape[:2]
+        if height <= self.tile_size and width <= self.tile_size:
+            return self.backend.detect(frame, size, confidence)
+
+        tiles = self.tiles(frame)
+        crops = [crop for _, crop in tiles]
+        if self.pool:
+            results = list(self.pool.map(lambda crop: self.backend.detect(crop, size, confidence), crops))
+        else:
+            results = self.backend.detect_batch(crops, size, confidence)
+
+        offsets = np.concatenate([np.tile(np.array(origin * 2, dtype=np.float32), (len(result), 1))
+                                  for (origin, _), result in zip(tiles, results)])
+        merged = Detections(np.concatenate([result.boxes for result in results]) + offsets,
+                            np.concatenate([result.scores for result in results]),
+                            np.concatenate([result.class_ids for result in results]))
+        return merge_nms(merged, self.merge_threshold)
+
+    def detect_batch(self, frames, size=640, confidence=0.5):
+        return [self.detect(frame, size, confidence) for frame in frames]
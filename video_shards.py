@@ -0,0 +1,315 @@
+"""Run a long recording through a detection backend on every core.
+
+One ObjectDetector process leaves most of a many-core machine idle. This
+splits the video into segments that start on keyframes (found with
+ffprobe when it is installed), so each seek lands exactly without decoding
+from the start. The segments are then handed to a process pool. Each
+worker loads one model instance, with its intra-op threads capped, and
+writes its segment to its own detection log in the output directory. A
+segment counts as done only once its .done marker exists. After a crash or
+a failed segment, rerun the same command: finished segments are skipped and
+only the rest are processed. When every segment is done, the logs are merged
+in frame order into one detection log (see detection_log.py).
+
+    python video_shards.py recording.mp4 --out shards --backend onnx --weights yolov8n.onnx \\
+        --workers 8 --threads 2 --merge recording.dlog
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from detection_backends import BACKENDS, create_backend
+from detection_log import DetectionLogReader, DetectionLogWriter, index_path, names_path
+
+PLAN = "plan.json"
+BATCH_FRAMES = 8
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+backend = None  # The worker process's model instance, created by init_worker
+
+
+def probe(path):
+    """(frame count, fps, keyframe indices) of the first video stream.
+
+    Keyframes come from ffprobe's packet list (no decoding). Without ffprobe
+    only the container's frame count is known and the keyframe list is empty.
+    """
+    if shutil.which("ffprobe"):
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+             "-show_entries", "stream=avg_frame_rate", "-of", "json", path],
+            capture_output=True, text=True, check=True).stdout
+        info = json.loads(output)
+        packets = sorted((float(packet["pts_time"]), "K" in packet["flags"])
+                         for packet in info["packets"] if packet.get("pts_time") not in (None, "N/A"))
+        numerator, denominator = info["streams"][0]["avg_frame_rate"].split("/")
+        fps = float(numerator) / float(denominator) if float(denominator) else 0.0
+        # Presentation order: a keyframe's index is its rank among all timestamps
+        keyframes = [i for i, (_, key) in enumerate(packets) if key]
+        return len(packets), fps, keyframes
+
+    import cv2
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open {path}")
+    count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    capture.release()
+    return count, fps, []
+
+
+def plan_segments(frame_count, keyframes, segments):
+    """[(start, end)] frame ranges of about equal length, starting on keyframes when known"""
+    segments = max(1, min(segments, frame_count))
+    starts = [0]
+    for i in range(1, segments):
+        target = frame_count * i // segments
+        if keyframes:
+            # Snap to the nearest keyframe; a segment may grow or shrink by one GOP
+            target = min(keyframes, key=lambda keyframe: abs(keyframe - target))
+        if target > starts[-1]:
+            starts.append(target)
+    return list(zip(starts, starts[1:] + [frame_count]))
+
+
+def load_plan(path, out, segments):
+    """The plan saved in out, or a new one; reusing it keeps segment files valid across reruns"""
+    plan_path = os.path.join(out, PLAN)
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            plan = json.load(f)
+        if plan["video"] == os.path.abspath(path):
+            return plan
+        raise ValueError(f"{out} holds segments of {plan['video']}; use another --out")
+    frame_count, fps, keyframes = probe(path)
+    if not frame_count:
+        raise ValueError(f"{path} reports no frames")
+    if not keyframes:
+        print("ffprobe not found: segments start at even frame counts and rely on OpenCV seeking")
+    # With ffprobe the frame count is exact; otherwise it is the container's estimate
+    plan = {"video": os.path.abspath(path), "frames": frame_count, "exact": bool(keyframes), "fps": fps or 30.0,
+            "keyframes": keyframes, "segments": plan_segments(frame_count, keyframes, segments)}
+    os.makedirs(out, exist_ok=True)
+    with open(plan_path, "w") as f:
+        json.dump(plan, f, indent=1)
+    return plan
+
+
+def segment_path(out, index):
+    return os.path.join(out, f"segment_{index:05d}.dlog")
+
+
+def done_path(out, index):
+    return segment_path(out, index) + ".done"
+
+
+def remove_log(path):
+    for leftover in (path, index_path(path), names_path(path)):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+
+def init_worker(backend_name, weights, threads):
+    """Load one model per worker process, limited to `threads` intra-op threads"""
+    global backend
+    # The OpenMP / BLAS caps come from the environment run() spawned this process with
+    import cv2
+    cv2.setNumThreads(1)
+    backend = create_backend(backend_name, weights, threads or 1)
+
+
+def seek(capture, start, keyframes=()):
+    """Position capture so that the next read() returns frame start.
+
+    A seek may land past the requested frame (e.g. on the next keyframe).
+    Then it backs off to the previous keyframe, or further and further
+    back when keyframes are unknown, and decodes forward to start.
+    """
+    import cv2
+    earlier = [keyframe for keyframe in keyframes if keyframe < start]
+    target = start
+    step = 16
+    while True:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+        position = int(capture.get(cv2.CAP_PROP_POS_FRAMES))
+        if position <= start:
+            break
+        if target == 0:
+            raise RuntimeError(f"cannot seek to frame {start}: decoding starts at {position}")
+        if earlier:
+            target = earlier.pop()
+        else:
+            target = max(0, start - step)
+            step *= 2
+    # Drop decoded frames up to the segment start
+    while position < start:
+        if not capture.grab():
+            raise RuntimeError(f"video ended at frame {position}, before frame {start}")
+        position += 1
+
+
+def process_segment(video, out, index, start, end, last, fps, start_time, size, confidence, keyframes=()):
+    """Detect every frame of [start, end) into the segment's own log; returns (index, frames, detections, seconds)"""
+    import cv2
+    began = time.perf_counter()
+    path = segment_path(out, index)
+    remove_log(path)  # A previous attempt may have died halfway
+    capture = cv2.VideoCapture(video)
+    seek(capture, start, keyframes)
+    writer = DetectionLogWriter(path, backend.names)
+    frame_index = start
+    detections = 0
+    try:
+        while frame_index < end:
+            batch = []
+            while len(batch) < BATCH_FRAMES and frame_index + len(batch) < end:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                batch.append(frame)
+            if not batch:
+                break
+            for result in backend.detect_batch(batch, size, confidence):
+                writer.append(start_time + frame_index / fps, frame_index, result)
+                detections += len(result)
+                frame_index += 1
+    finally:
+        writer.close()
+        capture.release()
+    # Container frame counts can be estimates, so only the last segment may come up short
+    if frame_index < end and not last:
+        raise RuntimeError(f"video ended at frame {frame_index}, inside segment {index}")
+    seconds = time.perf_counter() - began
+    with open(done_path(out, index), "w") as f:
+        json.dump({"start": start, "end": end, "frames": frame_index - start, "detections": detections,
+                   "seconds": seconds}, f)
+    return index, frame_index - start, detections, seconds
+
+
+def previous_keyframes(plan, start, count=4):
+    """The last few keyframes before start, enough to recover from a seek overshoot"""
+    return [keyframe for keyframe in plan.get("keyframes", []) if keyframe < start][-count:]
+
+
+def read_plan(out):
+    with open(os.path.join(out, PLAN)) as f:
+        return json.load(f)
+
+
+def decoded_frames(plan, out):
+    """Frames processed across all finished segments"""
+    total = 0
+    for index in range(len(plan["segments"])):
+        with open(done_path(out, index)) as f:
+            total += json.load(f)["frames"]
+    return total
+
+
+def pending_segments(plan, out):
+    return [(index, start, end) for index, (start, end) in enumerate(plan["segments"])
+            if not os.path.exists(done_path(out, index))]
+
+
+def run(video, out, backend_name="onnx", weights=None, workers=None, threads=1, segments=None, retries=1,
+        size=640, confidence=0.5, start_time=0.0):
+    """Process every unfinished segment; returns the indices that still failed"""
+    workers = workers or max(1, (os.cpu_count() or 1) // max(threads, 1))
+    plan = load_plan(video, out, segments or workers * 4)
+    todo = pending_segments(plan, out)
+    print(f"{plan['frames']} frames in {len(plan['segments'])} segments, {len(todo)} to process "
+          f"on {workers} workers x {threads} threads")
+    began = time.perf_counter()
+    frames = 0
+    # A spawned worker imports numpy, and so starts its BLAS pool, before init_worker
+    # runs; the caps only take effect if the worker inherits them at start
+    saved = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    os.environ.update(dict.fromkeys(THREAD_VARIABLES, str(threads or 1)))
+    try:
+        for attempt in range(retries + 1):
+            if not todo:
+                break
+            if attempt:
+                print(f"Retrying {len(todo)} segments")
+            # Spawned workers start clean instead of inheriting forked inference thread pools
+            with ProcessPoolExecutor(workers, mp_context=get_context("spawn"), initializer=init_worker,
+                                     initargs=(backend_name, weights, threads)) as pool:
+                futures = {pool.submit(process_segment, plan["video"], out, index, start, end,
+                                       end == plan["frames"], plan["fps"], start_time, size, confidence,
+                                       previous_keyframes(plan, start)): index
+                           for index, start, end in todo}
+                for future in as_completed(futures):
+                    try:
+                        index, count, detections, seconds = future.result()
+                    except Exception as e:
+                        print(f"Segment {futures[future]} failed: {e!r}")
+                        continue
+                    frames += count
+                    print(f"Segment {index}: {count} frames, {detections} detections, {count / seconds:.1f} FPS")
+            todo = pending_segments(plan, out)
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+    elapsed = time.perf_counter() - began
+    if frames:
+        print(f"{frames} frames in {elapsed:.1f}s, {frames / elapsed:.1f} FPS overall")
+    return [index for index, _, _ in todo]
+
+
+def merge(out, path):
+    """Concatenate every segment log in frame order into one detection log at path"""
+    plan = read_plan(out)
+    remove_log(path)
+    writer = None
+    for index in range(len(plan["segments"])):
+        reader = DetectionLogReader(segment_path(out, index))
+        if writer is None:
+            writer = DetectionLogWriter(path, reader.names)
+        writer.extend(reader.records)
+    writer.close()
+    print(f"Merged {len(plan['segments'])} segments into {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect objects in a long video across a process pool")
+    parser.add_argument("video")
+    parser.add_argument("--out", required=True, help="directory for the segment plan and per-segment logs")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--weights", help="model file for the backend")
+    parser.add_argument("--workers", type=int, help="processes; default: cores / threads")
+    parser.add_argument("--threads", type=int, default=1, help="intra-op threads per worker")
+    parser.add_argument("--segments", type=int, help="number of segments; default: 4 per worker")
+    parser.add_argument("--retries", type=int, default=1, help="extra attempts for failed segments")
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--start-time", type=float, default=0.0,
+                        help="Unix time of the first frame; log timestamps are this plus video time")
+    parser.add_argument("--merge", metavar="LOG", help="merge the segments into this detection log when all are done")
+    args = parser.parse_args()
+
+    failed = run(args.video, args.out, args.backend, args.weights, args.workers, args.threads, args.segments,
+                 args.retries, args.size, args.confidence, args.start_time)
+    if failed:
+        print(f"Segments {failed} failed; rerun the same command to retry only those")
+        return
+    plan = read_plan(args.out)
+    total = decoded_frames(plan, args.out)
+    if total != plan["frames"]:
+        if plan.get("exact"):
+            # Segments overlapped or left a gap; their frame indices can't be trusted
+            print(f"Segments decoded {total} frames but the video has {plan['frames']}; not merging")
+            return
+        print(f"Decoded {total} frames; the container estimated {plan['frames']}")
+    if args.merge:
+        merge(args.out, args.merge)
+
+
+if __name__ == "__main__":
+    main()
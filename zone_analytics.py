@@ -0,0 +1,189 @@
+"""Zone occupancy and line crossing counts over each frame's detections.
+
+Zones are polygons and lines are two-point segments, loaded from JSON:
+
+    {"zones": [{"name": "door", "polygon": [[100, 50], [300, 50], [300, 400], [100, 400]],
+                "classes": ["person"]}],
+     "lines": [{"name": "entrance", "points": [[0, 240], [640, 240]]}]}
+
+"classes" is optional (default: every class). update() tests every detection
+center against every zone edge in one NumPy pass and only adds to running
+counters, so its cost doesn't grow with history. Line crossings match each
+center to the nearest same-class center of the previous update. Per-zone
+and per-line aggregates are kept in arrays, so a lookup is O(1). They are
+appended to a JSON-lines file every flush_every seconds, after which the
+interval counters restart.
+"""
+import json
+import time
+
+import numpy as np
+
+
+def load_config(path):
+    with open(path) as f:
+        config = json.load(f)
+    return config.get("zones", []), config.get("lines", [])
+
+
+def class_mask(entries, names):
+    """(len(entries), len(names)) bool: which classes each zone or line counts"""
+    mask = np.ones((len(entries), len(names)), dtype=bool)
+    for i, entry in enumerate(entries):
+        if entry.get("classes"):
+            mask[i] = [name in entry["classes"] for name in names]
+    return mask
+
+
+class ZoneAnalytics:
+    def __init__(self, zones, lines, names, flush_path=None, flush_every=60.0, max_match_distance=80.0):
+        self.zone_names = [zone["name"] for zone in zones]
+        self.line_names = [line["name"] for line in lines]
+        self.zone_index = {name: i for i, name in enumerate(self.zone_names)}
+        self.line_index = {name: i for i, name in enumerate(self.line_names)}
+        self.zone_classes = class_mask(zones, names)
+        self.line_classes = class_mask(lines, names)
+        self.polygons = [np.asarray(zone["polygon"], dtype=np.float64) for zone in zones]
+
+        # All zone edges in one flat set; zone i owns edges starting at edge_starts[i]
+        starts = np.concatenate(self.polygons) if zones else np.zeros((0, 2))
+        ends = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in self.polygons]) if zones else starts
+        self.edge_x, self.edge_y = starts[:, 0], starts[:, 1]
+        self.edge_end_y = ends[:, 1]
+        rise = ends[:, 1] - starts[:, 1]
+        # Horizontal edges never cross a ray, so their slope is irrelevant
+        self.edge_slope = np.divide(ends[:, 0] - starts[:, 0], rise, out=np.zeros(len(rise)), where=rise != 0)
+        self.edge_starts = np.cumsum([0] + [len(polygon) for polygon in self.polygons[:-1]])
+
+        points = np.asarray([line["points"] for line in lines], dtype=np.float64).reshape(-1, 2, 2)
+        self.line_a, self.line_b = points[:, 0], points[:, 1]
+
+        zone_count, line_count = len(zones), len(lines)
+        self.current = np.zeros(zone_count, dtype=np.int64)
+        self.peak = np.zeros(zone_count, dtype=np.int64)
+        self.entries = np.zeros(zone_count, dtype=np.int64)
+        self.object_seconds = np.zeros(zone_count)
+        self.total_entries = np.zeros(zone_count, dtype=np.int64)
+        self.total_object_seconds = np.zeros(zone_count)
+        self.forward = np.zeros(line_count, dtype=np.int64)
+        self.backward = np.zeros(line_count, dtype=np.int64)
+        self.total_forward = np.zeros(line_count, dtype=np.int64)
+        self.total_backward = np.zeros(line_count, dtype=np.int64)
+
+        self.flush_path = flush_path
+        self.flush_every = flush_every
+        self.max_match_distance = max_match_distance
+        self.last_time = None
+        self.last_flush = None
+        self.previous_centers = np.zeros((0, 2))
+        self.previous_classes = np.zeros(0, dtype=np.int64)
+
+    def contains(self, centers):
+        """(N, zones) bool: even-odd ray casting for every center and zone at once"""
+        x = centers[:, 0:1]
+        y = centers[:, 1:2]
+        straddles = (self.edge_y > y) != (self.edge_end_y > y)
+        crosses = straddles & (x < self.edge_x + (y - self.edge_y) * self.edge_slope)
+        return np.add.reduceat(crosses, self.edge_starts, axis=1) % 2 == 1
+
+    def side(self, points):
+        """(N, lines) signed side of each point relative to each line"""
+        direction = self.line_b - self.line_a
+        offset = points[:, None, :] - self.line_a[None, :, :]
+        return direction[None, :, 0] * offset[:, :, 1] - direction[None, :, 1] * offset[:, :, 0]
+
+    def count_crossings(self, centers, class_ids):
+        previous = self.previous_centers
+        if not len(previous) or not len(centers):
+            return
+        # Each center continues the nearest same-class center of the last update
+        distance = np.linalg.norm(centers[:, None, :] - previous[None, :, :], axis=2)
+        distance[class_ids[:, None] != self.previous_classes[None, :]] = np.inf
+        nearest = distance.argmin(axis=1)
+        matched = distance[np.arange(len(centers)), nearest] <= self.max_match_distance
+        if not matched.any():
+            return
+        start, end = previous[nearest[matched]], centers[matched]
+        before, after = self.side(start), self.side(end)
+
+        # The path must also pass between the line's endpoints
+        path = end - start
+        a_side = path[:, None, 0] * (self.line_a[None, :, 1] - start[:, None, 1]) - \
+            path[:, None, 1] * (self.line_a[None, :, 0] - start[:, None, 0])
+        b_side = path[:, None, 0] * (self.line_b[None, :, 1] - start[:, None, 1]) - \
+            path[:, None, 1] * (self.line_b[None, :, 0] - start[:, None, 0])
+        crossing = (a_side * b_side < 0) & self.line_classes[:, class_ids[matched]].T
+        forward = ((before < 0) & (after >= 0) & crossing).sum(axis=0)
+        backward = ((before >= 0) & (after < 0) & crossing).sum(axis=0)
+        self.forward += forward
+        self.backward += backward
+        self.total_forward += forward
+        self.total_backward += backward
+
+    def update(self, timestamp, centers, class_ids):
+        """Add one frame's detection centers (N, 2) and class ids (N,)"""
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        if self.last_time is not None:
+            # Occupancy holds from the previous update until this one
+            elapsed = timestamp - self.last_time
+            self.object_seconds += self.current * elapsed
+            self.total_object_seconds += self.current * elapsed
+        if self.last_flush is None:
+            self.last_flush = timestamp
+
+        if len(self.zone_names):
+            inside = self.contains(centers) & self.zone_classes[:, class_ids].T
+            counts = inside.sum(axis=0)
+            # Without tracking, entries are counted as rises in occupancy
+            entered = np.maximum(counts - self.current, 0)
+            self.entries += entered
+            self.total_entries += entered
+            self.current = counts
+            np.maximum(self.peak, counts, out=self.peak)
+
+        if len(self.line_names):
+            self.count_crossings(centers, class_ids)
+            self.previous_centers, self.previous_classes = centers, class_ids
+
+        self.last_time = timestamp
+        if timestamp - self.last_flush >= self.flush_every:
+            self.flush(timestamp)
+
+    def zone(self, name):
+        """Current occupancy and totals for one zone"""
+        i = self.zone_index[name]
+        entries = int(self.total_entries[i])
+        return {
+            "current": int(self.current[i]),
+            "peak": int(self.peak[i]),
+            "entries": entries,
+            "object_seconds": float(self.total_object_seconds[i]),
+            "mean_dwell_seconds": float(self.total_object_seconds[i] / entries) if entries else 0.0,
+        }
+
+    def line(self, name):
+        i = self.line_index[name]
+        return {"forward": int(self.total_forward[i]), "backward": int(self.total_backward[i])}
+
+    def flush(self, timestamp=None):
+        """Append the interval's aggregates to flush_path and restart the interval"""
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.flush_path:
+            record = {
+                "start": self.last_flush,
+                "end": timestamp,
+                "zones": {name: {"current": int(self.current[i]), "peak": int(self.peak[i]),
+                                 "entries": int(self.entries[i]), "object_seconds": float(self.object_seconds[i])}
+                          for i, name in enumerate(self.zone_names)},
+                "lines": {name: {"forward": int(self.forward[i]), "backward": int(self.backward[i])}
+                          for i, name in enumerate(self.line_names)},
+            }
+            with open(self.flush_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        self.peak[:] = self.current
+        self.entries[:] = 0
+        self.object_seconds[:] = 0
+        self.forward[:] = 0
+        self.backward[:] = 0
+        self.last_flush = timestamp